@@ -0,0 +1,143 @@
+#!/usr/bin/env python3
+
+# Performance regression suite for the regex stages: runs adversarial bodies (huge
+# bracket runs, long whitespace runs, deep reply chains, words the food and date
+# patterns start on but never finish) through every stage and fails if one takes
+# longer than limitSeconds. Then parses them as whole emails with the guard on and
+# checks that every email is parsed or quarantined within its CPU budget, and how
+# often the guard tripped, and that the guard trips the same way in `workers` parser
+# processes started with spawn (which don't inherit the parent's settings), and
+# quarantines every email there when the budget is tiny. The two patterns the guard
+# work replaced are also timed in their old form, on smaller bodies, and must give
+# the same output as the old form on them and on a few short edge cases.
+#   python benchmarks/benchAdversarial.py [bodyLength] [limitSeconds] [cpuBudget] [workers]
+import multiprocessing
+import re
+import sys
+import time
+
+from corpus import makeEmail
+import repositoryPath
+
+from ramafood import dates, food, guard, parsers, pipeline, stats, text
+
+
+def adversarialBodies(length):
+    replies = length // 60
+    return {
+        'unclosed brackets': '[' * length,
+        'brackets and words': '[a ' * (length // 3) + 'pizza',
+        'new line run': 'Free pizza' + '\n' * length + 'x',
+        'mixed whitespace run': 'Free pizza' + '\n\t\r' * (length // 3) + 'x',
+        'spaces before food': 'be' + ' ' * length + 'x food',
+        'be ... food': 'be x ' * (length // 5) + 'food',
+        'one long word': 'be ' + 'a' * length + ' food',
+        'proximity words': 'of great free enjoy ' * (length // 20) + 'food',
+        'deep reply chain': ''.join('On Mon, Oct 1, 2018 at 9:00 AM Jordan Lee <jlee@ramapo.edu> wrote:\n' + '>' * (i % 200) + ' pizza\n'
+                                    for i in range(replies)),
+        '"On" without "wrote"': 'On ' * (length // 3),
+        'signature dashes': ' --\n' * (length // 4),
+        'date digits': '1/' * (length // 2),
+        'month names': 'October ' * (length // 8),
+        'dollar signs': '$' * length + ' pizza',
+    }
+
+
+stages = (
+    ('removeAllNewLines', text.removeAllNewLinesExceptParagraphChanges),
+    ('isThisAFoodEvent', food.isThisAFoodEvent),
+    ('removeSignature', text.removeSignature),
+    ('findEventDateString', dates.findEventDateString),
+    ('beautifyText', text.beautifyText),
+)
+
+
+def cpuSeconds(function, *args):
+    started = time.thread_time()
+    function(*args)
+    return time.thread_time() - started
+
+
+def legacyParagraphSplit(bodyText):
+    return re.split(r'(\n|\t|\r){2,}(?=(\*)*[A-Z)])', bodyText)
+
+
+sameOutputCases = ('a][]', '[]', 'x [] y [z]', '[a]]', ']][[', '\n\nA\n\t\n*B', 'a\r\r)b', '\n\n\n')
+
+
+# The bracket filter as the original script ran it, on every line
+def legacyBrackets(body):
+    return '\n'.join(re.sub(r'\[(\w|\W)+\]', '', line) for line in body.split('\n'))
+
+
+# The guard trips and number of events of parsing emails in workers processes
+def tripsInWorkers(emails, workers):
+    stats.stageStats = stats.newStageStats()
+    messages = ((num, routeName, rawMessage) for num, (routeName, rawMessage) in enumerate(emails, 1))
+    events = sum(len(events) for num, events in pipeline.parseMessages(messages, workers))
+    return dict(stats.stageStats['guardTrips']), events
+
+
+def main(bodyLength=100000, limitSeconds=2.0, cpuBudget=5.0, workers=2):
+    bodies = adversarialBodies(int(bodyLength))
+    limitSeconds = float(limitSeconds)
+    failures = 0
+
+    print('%-22s %s' % ('body', ' '.join('%19s' % name for name, stage in stages)))
+    for bodyName, body in bodies.items():
+        times = [cpuSeconds(stage, body) for name, stage in stages]
+        failures += sum(1 for i in times if i > limitSeconds)
+        print('%-22s %s' % (bodyName, ' '.join('%17.3fs%s' % (i, '!' if i > limitSeconds else ' ') for i in times)))
+
+    # Whole emails, with the guard on: each must be parsed or quarantined in about
+    # its budget (the caps bound the paragraph that is running when it runs out)
+    guard.useGuard(float(cpuBudget))
+    stats.stageStats = stats.newStageStats()
+    emails = [('other', makeEmail('Club <club@ramapo.edu>', 'Club news', body)) for body in bodies.values()]
+    emails.append(('digest', makeEmail('Ramapo Daily Digest <digest@ramapo.edu>', 'Daily Digest',
+                                       (60 * '-').join(['Digest', 'Announcements'] + ['\nEntry\n%s\n' % body for body in bodies.values()] + ['End']))))
+    slowest = 0.0
+    for routeName, rawMessage in emails:
+        seconds = cpuSeconds(parsers.parseRawMessage, routeName, rawMessage)
+        slowest = max(slowest, seconds)
+        if seconds > guard.messageCpuBudget + limitSeconds:
+            print('%s email took %.2f s' % (routeName, seconds))
+            failures += 1
+    print()
+    trips = dict(stats.stageStats['guardTrips'])
+    print('%d adversarial emails with the guard on: slowest %.3f s, guard trips %s' % (len(emails), slowest, trips or 'none'))
+
+    # The same in parser processes, and with a budget no email can meet
+    workers = int(workers)
+    workerTrips, events = tripsInWorkers(emails, workers)
+    print('in %d parser processes: guard trips %s' % (workers, workerTrips or 'none'))
+    if workerTrips != trips:
+        print('The guard tripped differently in the parser processes')
+        failures += 1
+    guard.useGuard(1e-7)
+    workerTrips, events = tripsInWorkers(emails, workers)
+    print('in %d parser processes with a %g s budget: %d events, guard trips %s' % (workers, guard.messageCpuBudget, events, workerTrips or 'none'))
+    if events != 0 or workerTrips.get('cpuBudget', 0) != len(emails):
+        print('The parser processes did not quarantine every email')
+        failures += 1
+
+    # The old forms, on bodies a twentieth of the size
+    small = adversarialBodies(int(bodyLength) // 20)
+    for name, legacy, current, bodyName in (('paragraph split', legacyParagraphSplit, text.paragraphBreakPattern.split, 'mixed whitespace run'),
+                                            ('bracket removal', legacyBrackets, text.removeBrackets, 'unclosed brackets')):
+        print('%-16s on %d characters of %-21s old %8.3f s  new %8.3f s' % (
+            name, len(small[bodyName]), bodyName, cpuSeconds(legacy, small[bodyName]), cpuSeconds(current, small[bodyName])))
+        for body in (small[bodyName],) + sameOutputCases:
+            if legacy(body) != current(body):
+                print('The new %s gives another output than the old one on %r' % (name, body[:40]))
+                failures += 1
+
+    if failures:
+        print('%d stages or emails went over the limit or changed the output' % failures)
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    multiprocessing.set_start_method('spawn')
+    sys.exit(main(*sys.argv[1:]))
@@ -0,0 +1,93 @@
+#!/usr/bin/env python3
+
+# Compares findEventDate with the three-iteration date search it replaced, which
+# tokenized the body and built a new parsedatetime Calendar for every date. Checks
+# that both pick the same date first, on the synthetic paragraphs and on every
+# month name and abbreviation, with and without a dot, before a year and tonight.
+#   python benchmarks/benchDateParsing.py [numberOfParagraphs] [repeats]
+import re
+import sys
+import timeit
+from datetime import datetime
+
+import parsedatetime
+
+from corpus import makeDigestParagraphs
+import repositoryPath
+
+from ramafood import dates, text
+
+
+def legacyConvertToPythonDatetimeObj(aDate):
+    c = parsedatetime.Constants()
+    c.BirthdayEpoch = 80
+    p = parsedatetime.Calendar(c)
+
+    time_struct, parse_status = p.parse(aDate)
+    return datetime(*time_struct[:6])
+
+
+# The date strings the old dateIteration1, 2 and 3 would have handed to parsedatetime
+def legacyFindDateString(body):
+    months = ('January', 'February', 'March', 'April', 'May', 'June', 'July',
+              'August', 'September', 'October', 'November', 'December')
+    monthsAbbreviated = ('Jan', 'Feb', 'Mar', 'Apr', 'Jun', 'Aug', 'Sept', 'Sep', 'Oct', 'Nov', 'Dec',
+                         "Jan.", "Feb.", "Mar.", "Apr.", "Aug.", "Sept.", "Sep.", "Oct.", "Nov.", "Dec.")
+
+    for previous, item, nxt in text.previous_and_next(body):
+        if (item in months or item in monthsAbbreviated) and nxt != None:
+            possibleDay = re.findall(r'\d+', nxt)
+            if possibleDay:
+                return item.replace(".", "") + ' ' + possibleDay[0]
+
+    for aPattern in (r'\d{1,2}[\/]{1} {0,1}\d{1,2}',
+                     r"\d{1,2}[\/-]{1} {0,1}\d{1,2} {0,1}[\/-]{1}\d{2,4}",
+                     r"\d{4}[\/-]{1} {0,1}\d{1,2}[\/-]{1} {0,1}\d{0,1}"):
+        date = re.search(aPattern, body)
+        if date != None:
+            return date.group(0)
+
+    date = re.search("(right now|tonight|today|tomorrow)", body, re.IGNORECASE)
+    if date != None:
+        return date.group(1)
+    date = re.search('now', body, re.IGNORECASE)
+    if date != None:
+        return date.group(0)
+    return ''
+
+
+def legacyFindEventDate(body):
+    dateString = legacyFindDateString(body)
+    if dateString == '':
+        return ''
+    return legacyConvertToPythonDatetimeObj(dateString)
+
+
+# "Jun. 2018 ... tonight": the month is a date only if the old iterations knew it
+def monthSpellings():
+    names = ('January', 'February', 'March', 'April', 'May', 'June', 'July', 'August', 'September', 'October', 'November', 'December',
+             'Jan', 'Feb', 'Mar', 'Apr', 'Jun', 'Jul', 'Aug', 'Sept', 'Sep', 'Oct', 'Nov', 'Dec')
+    return ['Pizza party %s%s 2018, come tonight' % (name, dot) for name in names for dot in ('', '.')]
+
+
+def main(numberOfParagraphs=2000, repeats=3):
+    paragraphs = makeDigestParagraphs(numberOfParagraphs)
+
+    disagreements = [par for par in paragraphs + monthSpellings() if legacyFindDateString(par) != dates.findDateString(par)[1]]
+    if disagreements:
+        print('findDateString disagrees with the old iterations on %d paragraphs' % len(disagreements))
+        return 1
+
+    legacyTime = min(timeit.repeat(lambda: [legacyFindEventDate(par) for par in paragraphs], number=1, repeat=repeats))
+    newTime = min(timeit.repeat(lambda: [dates.findEventDate(par) for par in paragraphs], number=1, repeat=repeats))
+
+    print('%d paragraphs' % len(paragraphs))
+    print('three iterations, new Calendar per date : %8.2f ms' % (legacyTime * 1000))
+    print('one scan, shared Calendar, LRU cache    : %8.2f ms' % (newTime * 1000))
+    print('speedup                                 : %8.2fx' % (legacyTime / newTime))
+    print(dates.convertToPythonDatetimeObjCached.cache_info())
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main(*(int(i) for i in sys.argv[1:])))
@@ -0,0 +1,85 @@
+#!/usr/bin/env python3
+
+# Measures the near-duplicate event index on a synthetic semester of events, some
+# of which come in a second time reworded (as a club's own email repeating a
+# digest entry would). Compares the LSH index with comparing every event against
+# every event kept so far, and checks that the index finds the planted duplicates.
+#   python benchmarks/benchDedup.py [numberOfEvents] [duplicateRatio]
+import random
+import sys
+import time
+from datetime import datetime, timedelta
+
+from corpus import foodSentences, plainSentences
+import repositoryPath
+
+from ramafood import dedup
+from ramafood.events import Event
+
+vocabulary = sorted(set(' '.join(foodSentences + plainSentences).split()))
+
+
+# Returns (events, the indexes of the events that repeat an earlier one)
+def makeSemesterEvents(count, duplicateRatio, seed=364):
+    rng = random.Random(seed)
+    firstDay = datetime(2018, 9, 4, 12, 0)
+    events = []
+    duplicates = set()
+    for i in range(count):
+        if events and rng.random() < duplicateRatio:
+            original = rng.choice(events)
+            words = original.eventDetails.split()
+            for j in rng.sample(range(len(words)), len(words) // 20):
+                words[j] = rng.choice(vocabulary)
+            details = 'Hi everyone, ' + ' '.join(words)
+            events.append(Event('Club email %d' % i, original.eventDate, details, source='other'))
+            duplicates.add(i)
+        else:
+            details = 'Club %d meets in room %d. %s' % (i, rng.randint(100, 400), ' '.join(rng.choice(vocabulary) for j in range(40)))
+            eventDate = firstDay + timedelta(days=rng.randint(0, 120))
+            events.append(Event('Event %d' % i, eventDate, details, source='digest'))
+    return events, duplicates
+
+
+def pairwiseDuplicates(events):
+    kept = []
+    found = set()
+    for i, event in enumerate(events):
+        signature = dedup.eventSignature(event.eventDetails)
+        day = dedup.eventDay(event.eventDate)
+        for keptSignature, keptDay in kept:
+            agreement = sum(1 for x, y in zip(signature, keptSignature) if x == y)
+            if keptDay == day and agreement >= dedup.duplicateThreshold * len(signature):
+                found.add(i)
+                break
+        else:
+            kept.append( (signature, day) )
+    return found
+
+
+def indexDuplicates(events):
+    index = dedup.newEventIndex()
+    return set(i for i, event in enumerate(events) if dedup.findDuplicateEvent(index, event) != None)
+
+
+def main(numberOfEvents=3000, duplicateRatio=0.2):
+    events, planted = makeSemesterEvents(int(numberOfEvents), float(duplicateRatio))
+
+    started = time.perf_counter()
+    byIndex = indexDuplicates(events)
+    indexTime = time.perf_counter() - started
+
+    started = time.perf_counter()
+    byPairs = pairwiseDuplicates(events)
+    pairwiseTime = time.perf_counter() - started
+
+    print('%d events, %d planted duplicates' % (len(events), len(planted)))
+    print('pairwise comparison : %8.2f ms, %d duplicates' % (pairwiseTime * 1000, len(byPairs)))
+    print('LSH index           : %8.2f ms, %d duplicates' % (indexTime * 1000, len(byIndex)))
+    print('planted duplicates missed by the index: %d, false duplicates: %d' % (len(planted - byIndex), len(byIndex - planted)))
+    print('speedup             : %8.2fx' % (pairwiseTime / indexTime))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main(*sys.argv[1:]))
@@ -0,0 +1,136 @@
+#!/usr/bin/env python3
+
+# Measures what a semester of events costs in memory: the events of a semester of
+# Daily Digests (every entry repeated on each day it runs), CSI Weekend Editions
+# and club emails are parsed once, and then held as the dicts the parsers used to
+# return (one copy of every string per email) and as Event records. Also compares
+# the pickled size of the events, which is what the parser processes send back,
+# and the time to turn them into MongoDB documents and feed JSON.
+#   python benchmarks/benchEventMemory.py [weekdays] [newEntriesPerDay] [daysAnEntryRuns]
+import gc
+import json
+import pickle
+import random
+import sys
+import time
+import tracemalloc
+
+from corpus import makeParagraph, makeEmail, makeWeekendEmails, makeOtherEmails
+import repositoryPath
+
+from ramafood import pipeline, storage, feed
+from ramafood.events import Event
+
+
+# One digest a weekday. Every day brings newEntriesPerDay entries and each entry
+# stays in the digest for daysAnEntryRuns days, like the real digest's reminders.
+def makeSemesterDigests(weekdays, newEntriesPerDay, daysAnEntryRuns, seed=364):
+    rng = random.Random(seed)
+    running = []
+    emails = []
+    for day in range(weekdays):
+        running = [(title, body, daysLeft - 1) for title, body, daysLeft in running if daysLeft > 1]
+        running.extend(('Event %d-%d' % (day, j), makeParagraph(rng, rng.random() < 0.5), daysAnEntryRuns) for j in range(newEntriesPerDay))
+        entries = ['Ramapo College Daily Digest', 'Today\'s announcements']
+        entries.extend('\n%s\n%s\n' % (title, body) for title, body, daysLeft in running)
+        entries.append('You are receiving this email because you are a Ramapo student.')
+        emails.append(makeEmail('Ramapo Daily Digest <digest@ramapo.edu>', 'Daily Digest %d' % day, (60 * '-').join(entries)))
+    return emails
+
+
+def semesterEvents(weekdays, newEntriesPerDay, daysAnEntryRuns):
+    emails = makeSemesterDigests(weekdays, newEntriesPerDay, daysAnEntryRuns)
+    emails += makeWeekendEmails(weekdays // 5) + makeOtherEmails(3 * weekdays)
+    messages = ((num, ('digest' if num <= weekdays else 'csiWeekend' if num <= weekdays + weekdays // 5 else 'other'), rawMessage)
+                for num, rawMessage in enumerate(emails, 1))
+    return [oneEvent for num, events in pipeline.parseMessages(messages) for oneEvent in events]
+
+
+# The parsed events as plain data, without any string shared between events, the
+# way every email's parse made its own: (title, naive date or CSI text, details, source, UID)
+def parsedFields(events):
+    return [(i.title.encode(), i.dateText or (i.eventDate.replace(tzinfo=None) if i.eventDate != None else ''), i.eventDetails.encode(), i.source, i.messageUid)
+            for i in events]
+
+
+def asDicts(fields):
+    return [{'title': title.decode(), 'eventDate': eventDate, 'eventDetails': details.decode(), 'sources': [source]}
+            for title, eventDate, details, source, messageUid in fields]
+
+
+# Event records sharing their texts, as pipeline.parseMessages makes them
+def asEvents(fields):
+    texts = dict()
+    events = []
+    for title, eventDate, details, source, messageUid in fields:
+        oneEvent = Event(title.decode(), eventDate, details.decode(), eventDate if isinstance(eventDate, str) else '', source, messageUid)
+        oneEvent.shareTexts(texts)
+        events.append(oneEvent)
+    return events
+
+
+# Bytes still allocated by build(fields) when it returns, and the result
+def heldBytes(build, fields):
+    gc.collect()
+    tracemalloc.start()
+    result = build(fields)
+    gc.collect()
+    held = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return held, result
+
+
+def legacyDocument(event):
+    return {'fingerprint': event['fingerprint'], 'title': event['title'], 'eventDate': event['eventDate'],
+            'eventDetails': event['eventDetails'], 'expiresAt': feed.eventExpiry(event['eventDate'])}
+
+
+def legacyFeedEntry(event):
+    eventDate = event['eventDate']
+    if not isinstance(eventDate, str):
+        eventDate = eventDate.isoformat(timespec='minutes')
+    return {'id': event['fingerprint'], 'title': event['title'].strip(), 'date': eventDate,
+            'details': event['eventDetails'].strip(), 'sources': event['sources']}
+
+
+def seconds(function, events, repeats=5):
+    best = None
+    for i in range(repeats):
+        started = time.perf_counter()
+        function(events)
+        elapsed = time.perf_counter() - started
+        best = elapsed if best == None else min(best, elapsed)
+    return best
+
+
+def main(weekdays=75, newEntriesPerDay=20, daysAnEntryRuns=5):
+    fields = parsedFields(semesterEvents(weekdays, newEntriesPerDay, daysAnEntryRuns))
+    gc.collect()
+    distinctDetails = len(set(details for title, eventDate, details, source, messageUid in fields))
+    print('%d weekdays: %d events, %d distinct event details, %d KB of details' % (
+        weekdays, len(fields), distinctDetails, sum(len(i[2]) for i in fields) // 1024))
+
+    dictBytes, dicts = heldBytes(asDicts, fields)
+    eventBytes, events = heldBytes(asEvents, fields)
+    print('held in memory    : dicts %8d KB   Event records %8d KB   (%.1fx smaller)' % (dictBytes // 1024, eventBytes // 1024, dictBytes / eventBytes))
+
+    dictsPickled, eventsPickled = len(pickle.dumps(dicts, pickle.HIGHEST_PROTOCOL)), len(pickle.dumps(events, pickle.HIGHEST_PROTOCOL))
+    print('pickled           : dicts %8d KB   Event records %8d KB' % (dictsPickled // 1024, eventsPickled // 1024))
+
+    for oneEvent, oneDict in zip(events, dicts):
+        oneEvent.fingerprint = oneDict['fingerprint'] = storage.eventFingerprint(oneEvent)
+    dictsDocuments = seconds(lambda events: [legacyDocument(i) for i in events], dicts)
+    eventsDocuments = seconds(lambda events: [dict(i.document(), expiresAt=feed.eventExpiry(i.eventDate)) for i in events], events)
+    print('MongoDB documents : dicts %8.1f ms   Event records %8.1f ms' % (dictsDocuments * 1000, eventsDocuments * 1000))
+    dictsFeed = seconds(lambda events: json.dumps([legacyFeedEntry(i) for i in events], separators=(',', ':'), ensure_ascii=False), dicts)
+    eventsFeed = seconds(lambda events: json.dumps([feed.feedEntry(i) for i in events], separators=(',', ':'), ensure_ascii=False), events)
+    print('feed JSON         : dicts %8.1f ms   Event records %8.1f ms' % (dictsFeed * 1000, eventsFeed * 1000))
+
+    if [(i.title, i.eventDetails) for i in events] != [(i['title'], i['eventDetails']) for i in dicts]:
+        print('The Event records hold other events than the dicts')
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main(*(int(i) for i in sys.argv[1:])))
@@ -0,0 +1,111 @@
+#!/usr/bin/env python3
+
+# Checks and times the bulk event writer on the events of a synthetic corpus, in
+# mongomock (or, given a connection string, in a scratch database of a local mongod
+# that is dropped at the end). The corpus is parsed and written, then parsed again
+# as a later run would parse it (the dates' time of day is the time of the parse)
+# and written again, which must insert and update nothing. Then one event gets a
+# new source, which must update exactly that event. Then the events are written to
+# a collection that already holds legacyEvents of them twice each, the way the
+# old script inserted them (no fingerprint, no sources): they must be fingerprinted
+# and updated, not inserted again. Prints the counts and how long each write took
+# with batchSize events per round trip, and exits 1 when a count is wrong.
+#   python benchmarks/benchEventWrites.py [numberOfDigests] [batchSize] [mongodb://localhost:27017]
+import sys
+import time
+from email.parser import BytesHeaderParser
+
+from corpus import makeCorpus
+import repositoryPath
+
+from ramafood import dates, parsers, pipeline, storage
+from ramafood.events import Event
+
+scratchDatabase = 'ramafoodWriteBench'
+legacyEvents = 10
+
+
+def parseCorpus(emails):
+    # What a new process starts with: no date parsed yet today
+    dates.convertToPythonDatetimeObjCached.cache_clear()
+    headerParser = BytesHeaderParser()
+    routes = [parsers.routeEmail(headerParser.parsebytes(rawMessage)) for rawMessage in emails]
+    messages = [(num, route[0], rawMessage) for num, (route, rawMessage) in enumerate(zip(routes, emails), 1) if route != None]
+    return [oneEvent for num, events in pipeline.parseMessages(messages) for oneEvent in events]
+
+
+# One event as the old script's insert_one wrote it
+def legacyDocument(event):
+    return {'title': event.title, 'eventDate': event.dateText or event.eventDate, 'eventDetails': event.eventDetails}
+
+
+def timedWrite(collection, events, batchSize):
+    started = time.perf_counter()
+    counts = storage.writeEvents(collection, events, batchSize)
+    return counts, time.perf_counter() - started
+
+
+def main(numberOfDigests='40', batchSize='100', connectionString=None):
+    emails = makeCorpus(int(numberOfDigests))
+    batchSize = int(batchSize)
+
+    if connectionString == None:
+        import mongomock
+        client = mongomock.MongoClient(tz_aware=True)
+    else:
+        from pymongo import MongoClient
+        client = MongoClient(connectionString, serverSelectionTimeoutMS=3000, tz_aware=True)
+    collection = client[scratchDatabase].events
+    failures = 0
+
+    def check(name, counts, seconds, expected):
+        nonlocal failures
+        ok = counts == expected
+        failures += not ok
+        print('%-26s inserted %5d  updated %5d  skipped %5d  in %7.1f ms  %s' % (
+            name, counts['inserted'], counts['updated'], counts['skipped'], seconds * 1000, 'ok' if ok else 'expected %s' % expected))
+
+    try:
+        events = parseCorpus(emails)
+        distinct = len(set(storage.eventFingerprint(i) for i in events))
+        print('%d emails, %d events, %d distinct, %d per batch' % (len(emails), len(events), distinct, batchSize))
+
+        counts, seconds = timedWrite(collection, events, batchSize)
+        check('first run', counts, seconds, {'inserted': distinct, 'updated': 0, 'skipped': len(events) - distinct})
+        time.sleep(1.1)     # A later run parses dates with another time of day
+        events = parseCorpus(emails)
+        counts, seconds = timedWrite(collection, events, batchSize)
+        check('same emails again', counts, seconds, {'inserted': 0, 'updated': 0, 'skipped': len(events)})
+
+        stored = Event.fromDocument(collection.find_one({'sources': ['digest']}))
+        stored.sources.append('other')
+        counts, seconds = timedWrite(collection, [stored], batchSize)
+        check('one new source', counts, seconds, {'inserted': 0, 'updated': 1, 'skipped': 0})
+        if collection.count_documents({}) != distinct:
+            print('%d events stored, %d expected' % (collection.count_documents({}), distinct))
+            failures += 1
+
+        legacy = client[scratchDatabase].legacyEvents
+        firstOfEach = dict()
+        for oneEvent in events:
+            firstOfEach.setdefault(storage.eventFingerprint(oneEvent), oneEvent)
+        for oneEvent in list(firstOfEach.values())[:legacyEvents]:
+            legacy.insert_many([legacyDocument(oneEvent), legacyDocument(oneEvent)])
+        fingerprinted = storage.fingerprintLegacyEvents(legacy)
+        counts, seconds = timedWrite(legacy, events, batchSize)
+        check('over legacy documents', counts, seconds, {'inserted': distinct - legacyEvents, 'updated': legacyEvents, 'skipped': len(events) - distinct})
+        if fingerprinted != legacyEvents or legacy.count_documents({}) != distinct + legacyEvents:
+            print('%d legacy documents fingerprinted, %d events stored, %d and %d expected' % (
+                fingerprinted, legacy.count_documents({}), legacyEvents, distinct + legacyEvents))
+            failures += 1
+    finally:
+        client.drop_database(scratchDatabase)
+        client.close()
+
+    if failures:
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main(*sys.argv[1:]))
@@ -0,0 +1,100 @@
+#!/usr/bin/env python3
+
+# Measures the event feed on a synthetic semester of events: how long building it
+# takes and how small it is compressed. Given a MongoDB connection string (a local
+# mongod), it also loads the events into a scratch database and compares how many
+# refreshes per second the app gets from reading the feed document with how many
+# it got from querying the events collection, with several clients at once. The
+# scratch database is dropped at the end.
+#   python benchmarks/benchFeed.py [numberOfEvents] [mongodb://localhost:27017] [clients] [seconds]
+import random
+import sys
+import threading
+import time
+from datetime import datetime, timedelta
+
+from corpus import foodSentences, plainSentences, dateSentences
+import repositoryPath
+
+from ramafood import feed, storage
+from ramafood.events import Event, startOfToday
+
+scratchDatabase = 'ramafoodFeedBench'
+
+
+# Events spread over the past and the next two months, like a semester of stored
+# events. A tenth have a text date, as the CSI Weekend Edition's do.
+def makeEvents(count, seed=364):
+    rng = random.Random(seed)
+    now = datetime.now().replace(second=0, microsecond=0)
+    events = []
+    for i in range(count):
+        details = ' '.join([rng.choice(dateSentences), rng.choice(foodSentences)] + [rng.choice(plainSentences) for j in range(4)])
+        if rng.random() < 0.1:
+            eventDate = dateText = '%dth October' % rng.randint(4, 30)
+        else:
+            eventDate = now + timedelta(days=rng.randint(-60, 60), hours=rng.randint(0, 12))
+            dateText = ''
+        event = Event('Event %d' % i, eventDate, details, dateText, 'digest')
+        event.fingerprint = storage.eventFingerprint(event)
+        events.append(event)
+    return events
+
+
+def measureReads(read, clients, seconds):
+    counts = [0] * clients
+    deadline = time.monotonic() + seconds
+
+    def client(number):
+        while time.monotonic() < deadline:
+            read()
+            counts[number] += 1
+
+    threads = [threading.Thread(target=client, args=(i,)) for i in range(clients)]
+    for i in threads:
+        i.start()
+    for i in threads:
+        i.join()
+    return sum(counts) / seconds
+
+
+def main(numberOfEvents='3000', connectionString=None, clients='8', seconds='5'):
+    events = makeEvents(int(numberOfEvents))
+    upcoming = [i for i in events if i.eventDate == None or i.eventDate >= startOfToday()]
+
+    started = time.perf_counter()
+    eventsJson, etag = feed.feedEventsJson(upcoming)
+    body = feed.feedBody(eventsJson, 1, etag)
+    buildTime = time.perf_counter() - started
+    print('%d events, %d upcoming: feed built in %.2f ms, %d KB of JSON, %d KB gzip-compressed' % (
+        len(events), len(upcoming), buildTime * 1000, len(eventsJson) // 1024, len(body) // 1024))
+
+    if connectionString == None:
+        print('Give a MongoDB connection string to measure read throughput')
+        return 0
+
+    from pymongo import MongoClient
+    client = MongoClient(connectionString, serverSelectionTimeoutMS=3000)
+    database = client[scratchDatabase]
+    try:
+        database.events.insert_many([dict(i.document(), sources=i.sources, expiresAt=feed.eventExpiry(i.eventDate)) for i in events])
+        feed.ensureEventIndexes(database.events)
+        feed.publishFeed(database.events, database.feed)
+
+        clients, seconds = int(clients), float(seconds)
+        liveRate = measureReads(lambda: feed.upcomingEvents(database.events), clients, seconds)
+        feedRate = measureReads(lambda: database.feed.find_one({'_id': feed.feedDocumentId}), clients, seconds)
+        # What a client that already has the current feed reads
+        etagRate = measureReads(lambda: database.feed.find_one({'_id': feed.feedDocumentId}, {'etag': 1}), clients, seconds)
+        print('%d clients, %g s each:' % (clients, seconds))
+        print('query the events collection : %10.0f refreshes/s' % liveRate)
+        print('read the feed document      : %10.0f refreshes/s (%.1fx)' % (feedRate, feedRate / liveRate))
+        print('check the feed ETag only    : %10.0f refreshes/s (%.1fx)' % (etagRate, etagRate / liveRate))
+    finally:
+        client.drop_database(scratchDatabase)
+        client.close()
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main(*sys.argv[1:]))
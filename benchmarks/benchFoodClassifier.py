@@ -0,0 +1,95 @@
+#!/usr/bin/env python3
+
+# Trains the food model on half of a set of paragraphs labeled by the regex rules
+# and compares the two engines on the other half: paragraphs per second for the
+# regex rules one paragraph at a time and for the model in batches of several
+# sizes (20 is about one Daily Digest), and how often the model agrees with the
+# rules. The paragraphs are synthetic digest entries, or the ones written by
+# python -m ramafood.foodmodel export when a labeled file is given. Then parses a
+# synthetic corpus with the model and checks that the parsers hand the engine
+# every email's paragraphs in one batch, and that a paragraph with NUL characters
+# in a batch doesn't change how the others are scored. Needs NumPy.
+#   python benchmarks/benchFoodClassifier.py [numberOfParagraphs | labeled.jsonl] [repeats]
+import importlib.util
+import sys
+import timeit
+from email.parser import BytesHeaderParser
+
+from corpus import makeCorpus, makeDigestParagraphs
+import repositoryPath
+
+from ramafood import food, foodmodel, parsers, pipeline
+
+
+def timeEngine(engine, paragraphs, batchSize, repeats):
+    batches = [paragraphs[i:i + batchSize] for i in range(0, len(paragraphs), batchSize)]
+    seconds = min(timeit.repeat(lambda: [engine(i) for i in batches], number=1, repeat=repeats))
+    return len(paragraphs) / seconds
+
+
+# The sizes of the batches the model engine gets while the corpus is parsed
+def parserBatchSizes(model, emails):
+    batchSizes = []
+
+    def countingEngine(paragraphs):
+        batchSizes.append(len(paragraphs))
+        return foodmodel.predictFood(model, paragraphs)
+
+    food.foodEngines['counting'] = countingEngine
+    food.foodEngine, food.foodModel = 'counting', model
+    try:
+        headerParser = BytesHeaderParser()
+        routes = [parsers.routeEmail(headerParser.parsebytes(rawMessage)) for rawMessage in emails]
+        list(pipeline.parseMessages((num, route[0], rawMessage) for num, (route, rawMessage) in enumerate(zip(routes, emails), 1) if route != None))
+    finally:
+        food.foodEngine, food.foodModel = 'regex', None
+        del food.foodEngines['counting']
+    return batchSizes
+
+
+def main(paragraphsOrPath='20000', repeats='3'):
+    if importlib.util.find_spec('numpy') == None:
+        print('benchFoodClassifier needs NumPy')
+        return 1
+
+    if paragraphsOrPath.endswith('.jsonl'):
+        paragraphs, labels = foodmodel.readLabeledParagraphs(paragraphsOrPath)
+    else:
+        paragraphs = makeDigestParagraphs(int(paragraphsOrPath))
+        labels = food.regexFoodEngine(paragraphs)
+    half = len(paragraphs) // 2
+    training, held = paragraphs[:half], paragraphs[half:]
+
+    started = timeit.default_timer()
+    model = foodmodel.trainFoodModel(training, labels[:half])
+    print('%d training paragraphs (%d about food), trained in %.2f s' % (half, sum(labels[:half]), timeit.default_timer() - started))
+
+    predicted = foodmodel.predictFood(model, held)
+    agreement = sum(1 for x, y in zip(predicted, labels[half:]) if x == y)
+    missed = sum(1 for x, y in zip(predicted, labels[half:]) if y and not x)
+    print('agreement with the regex rules on %d held out paragraphs: %.2f%% (%d food paragraphs missed, %d extra)' % (
+        len(held), 100 * agreement / len(held), missed, len(held) - agreement - missed))
+
+    repeats = int(repeats)
+    print('regex rules, one at a time : %10.0f paragraphs/s' % timeEngine(food.regexFoodEngine, held, 1, repeats))
+    for batchSize in (1, 20, 1000):
+        rate = timeEngine(lambda batch: foodmodel.predictFood(model, batch), held, batchSize, repeats)
+        print('model, batches of %-9d : %10.0f paragraphs/s' % (batchSize, rate))
+
+    emails = makeCorpus(10)
+    batchSizes = parserBatchSizes(model, emails)
+    print('parsing %d emails: %d engine calls, %d paragraphs, largest batch %d' % (
+        len(emails), len(batchSizes), sum(batchSizes), max(batchSizes)))
+    if len(batchSizes) > len(emails):
+        print('The parsers called the engine more than once per email')
+        return 1
+
+    withNul = foodmodel.predictFood(model, ['free\0pizza\0'] + held[:100])
+    if len(withNul) != 101 or withNul[1:] != predicted[:100]:
+        print('A paragraph with NUL characters changed the scores of the others')
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main(*sys.argv[1:]))
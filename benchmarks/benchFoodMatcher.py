@@ -0,0 +1,73 @@
+#!/usr/bin/env python3
+
+# Compares the compiled two-stage food matcher in ramafood.food with the pattern loop
+# it replaced, on digest-sized inputs. Also checks that both give the same answers.
+#   python benchmarks/benchFoodMatcher.py [numberOfParagraphs] [repeats]
+import re
+import sys
+import timeit
+
+from corpus import makeDigestParagraphs
+import repositoryPath
+
+from ramafood import food
+
+
+# The pattern loop from isThisAFoodEvent before the rules were compiled
+def legacyIsThisAFoodEvent(par):
+    if not food.isThisAFreeEvent(par):
+        return False
+
+    foodKeywordPatterns = (
+        r"Food will be", r'\brefreshment', r'and food',
+        r"food and", r'\bdrinks\b', r'ice[- \.]cream',
+        r'\bpizza\b', r'\bsandwich\b', r"\bmoe's\b",
+        r"\bchipotle\b", r"\bmozzarella\b", r"\btaco\b",
+        r"for food", r"\bbagel\b", r"\bpasta\b",
+        r"\bnuggets\b", "\bchilli\b", "\bdumpling\b",
+        "\bmomo\b", r"\bfajita\b", r"\bchicken\b",
+        r"\bpork\b", r"\broast\b", r"\bcheese\b",
+        r"enchilada", r"\bwings\b", r"\bpie\b",
+        r"\bnachos\b", r"\bcookies\b", r"burger",
+        r"\bturkey\b", r"will be served", r'cake\b',
+        r'snack', r'\bdessert\b', r'\bdinner\b',
+        r"nicky's", r"bbq", r'\bnoodles\b',
+        r'\bhalal\b', r'\bkosher\b', r'fries', r'cuisine',
+        r'jun lung', r'carnival\b',
+        r"\bgreat\W+(?:\w+\W+){0,2}?food\b",
+        r"ve\W+(?:\w+\W+){0,2}?food\b",
+        r"\bmo([:]){0,1}mo(s){0,1}\b",
+        r"\bfree\W+(?:\w+\W+){0,2}?food\b",
+        r"\bbe\W+(?:\w+\W+){0,6}?food\b",
+        r"\bfood\W+(?:\w+\W+){0,4}?from\b",
+        r"\bof\W+(?:\w+\W+){0,2}?food\b",
+        r"\benjoy\W+(?:\w+\W+){0,5}?food\b"
+    )
+
+    for aPattern in foodKeywordPatterns:
+        if re.search(aPattern, par, re.IGNORECASE):
+            return True
+    return False
+
+
+def main(numberOfParagraphs=2000, repeats=5):
+    paragraphs = makeDigestParagraphs(numberOfParagraphs)
+
+    disagreements = [par for par in paragraphs if legacyIsThisAFoodEvent(par) != food.isThisAFoodEvent(par)]
+    if disagreements:
+        print('The compiled matcher disagrees with the pattern loop on %d paragraphs' % len(disagreements))
+        return 1
+
+    legacyTime = min(timeit.repeat(lambda: [legacyIsThisAFoodEvent(par) for par in paragraphs], number=1, repeat=repeats))
+    compiledTime = min(timeit.repeat(lambda: [food.isThisAFoodEvent(par) for par in paragraphs], number=1, repeat=repeats))
+
+    foodCount = sum(1 for par in paragraphs if food.isThisAFoodEvent(par))
+    print('%d paragraphs, %d about food' % (len(paragraphs), foodCount))
+    print('pattern loop     : %8.2f ms  (%10.0f paragraphs/sec)' % (legacyTime * 1000, len(paragraphs) / legacyTime))
+    print('compiled matcher : %8.2f ms  (%10.0f paragraphs/sec)' % (compiledTime * 1000, len(paragraphs) / compiledTime))
+    print('speedup          : %8.2fx' % (legacyTime / compiledTime))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main(*(int(i) for i in sys.argv[1:])))
@@ -0,0 +1,84 @@
+#!/usr/bin/env python3
+
+# Compares converting a whole Daily Digest entry or email body with html2text once
+# against the old way, one html2text call per line, on digests wrapped at 72
+# columns the way plain text email is. Prints the cost per digest and checks that
+# both give the same event details.
+#   python benchmarks/benchHtmlToText.py [numberOfDigests] [entriesPerDigest] [repeats]
+import random
+import re
+import sys
+import textwrap
+import timeit
+
+from corpus import makeParagraph
+import repositoryPath
+
+from ramafood import text
+
+
+def legacyDigestBody(paragraph):
+    import html2text
+    lines = paragraph.split('\n')
+    return ''.join(html2text.html2text(lines[i]) for i in range(2, len(lines) -1))
+
+
+def legacyBeautifyText(bodyText):
+    import html2text
+    body = []
+    for i in bodyText.split('\n'):
+        i = html2text.html2text(i)
+        i = re.sub(r'^https?:\/\/.*[\r\n]*', '', i)
+        for imageType in ['.jpg', '.jpeg', '.bmp', '.gif', '<', 'KB']:
+            if imageType in i:
+                i = " "
+                break
+        i = re.sub( r'\[(\w|\W)+\]', '', i)
+        body.append(i)
+    return ''.join(body)
+
+
+def newDigestBody(paragraph):
+    return text.textToMarkdown('\n'.join(paragraph.split('\n')[2:-1]))
+
+
+# Digest entries as parseDailyDigestEmails sees them: a blank line, the title,
+# the announcement wrapped at 72 columns, some with a link, an inline image or
+# markup, and a trailing newline
+def makeDigests(count, entriesPerDigest, seed=364):
+    rng = random.Random(seed)
+    extras = ('', '', 'https://ramapo.edu/events/%d', '[inline image %d]', 'See <b>flyer</b> (%d KB attached)', 'RSVP <a\nhref="https://ramapo.edu/rsvp/%d">here</a>')
+    digests = []
+    for i in range(count):
+        entries = []
+        for j in range(entriesPerDigest):
+            lines = textwrap.wrap(makeParagraph(rng, rng.random() < 0.3), 72)
+            extra = rng.choice(extras)
+            if extra:
+                lines.append(extra.replace('%d', str(j)))
+            entries.append('\nEvent %d-%d\n%s\n' % (i, j, '\n'.join(lines)))
+        digests.append(entries)
+    return digests
+
+
+def eventDetails(body):
+    return ' '.join(text.removeAllNewLinesExceptParagraphChanges(body).split())
+
+
+def main(numberOfDigests=20, entriesPerDigest=20, repeats=3):
+    digests = makeDigests(numberOfDigests, entriesPerDigest)
+    entries = [entry for digest in digests for entry in digest]
+    # tags that span lines are the one place where the old way went wrong
+    spanningTags = sum(1 for entry in entries if '<a\n' in entry)
+
+    for name, legacy, new in (('digest entries', legacyDigestBody, newDigestBody), ('beautifyText', legacyBeautifyText, text.beautifyText)):
+        differences = sum(1 for entry in entries if eventDetails(legacy(entry)) != eventDetails(new(entry)))
+        legacyTime = min(timeit.repeat(lambda: [legacy(i) for i in entries], number=1, repeat=repeats))
+        newTime = min(timeit.repeat(lambda: [new(i) for i in entries], number=1, repeat=repeats))
+        print('%-15s per line %8.2f ms/digest  whole %8.2f ms/digest  speedup %6.2fx  different details %d (%d with tags spanning lines)' % (
+            name, legacyTime * 1000 / len(digests), newTime * 1000 / len(digests), legacyTime / newTime, differences, spanningTags))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main(*(int(i) for i in sys.argv[1:])))
@@ -0,0 +1,91 @@
+#!/usr/bin/env python3
+
+# Runs the IDLE daemon against the IMAP stand-in while another thread delivers
+# club emails one at a time, and measures the time from delivery to the events
+# reaching storage. A quarter of the way through, the parser processes are killed;
+# halfway through, the connection is dropped; three quarters of the way through,
+# storing fails once as if MongoDB were unreachable. The daemon must recover from
+# all three and store every email.
+#   python benchmarks/benchIdleDaemon.py [numberOfEmails] [millisecondsBetweenEmails] [roundTripMilliseconds]
+import asyncio
+import multiprocessing
+import os
+import signal
+import statistics
+import sys
+import threading
+import time
+
+from corpus import makeOtherEmails
+from imapStandIn import IMAPStandIn
+import repositoryPath
+
+from pymongo.errors import AutoReconnect
+
+from ramafood import daemon, parsers
+
+
+def main(numberOfEmails=40, millisecondsBetweenEmails=200, roundTripMilliseconds=10):
+    # Only the emails that have an event can be timed
+    emails = [raw for raw in makeOtherEmails(4 * numberOfEmails) if parsers.parseRawMessage('other', raw)][:numberOfEmails]
+    titles = [parsers.parseRawMessage('other', raw)[0].title for raw in emails]
+
+    M = IMAPStandIn([], roundTripMilliseconds / 1000)
+    delivered = dict()
+    stored = dict()
+    allStored = threading.Event()
+    storeFailures = []
+
+    def connect():
+        M.login('student@ramapo.edu', 'password')
+        M.select('dataOther')
+        return M
+
+    def storeEvents(events):
+        if storeFailures:
+            storeFailures.pop()
+            raise AutoReconnect('database unreachable')
+        for oneEvent in events:
+            stored.setdefault(oneEvent.title, time.perf_counter())
+        if len(stored) >= len(emails):
+            allStored.set()
+
+    def deliver():
+        time.sleep(1)   # Let the daemon log in and start idling
+        for num, (title, raw) in enumerate(zip(titles, emails)):
+            if num == len(emails) // 4:
+                for process in multiprocessing.active_children():
+                    os.kill(process.pid, signal.SIGKILL)
+            if num == len(emails) // 2:
+                M.dropConnection()
+            if num == 3 * len(emails) // 4:
+                storeFailures.append(True)
+            delivered[title] = time.perf_counter()
+            M.append(raw)
+            time.sleep(millisecondsBetweenEmails / 1000)
+
+    async def run():
+        daemonTask = asyncio.create_task(daemon.runDaemon(connect, storeEvents, idleTimeout=5, maxBackoff=2))
+        await asyncio.get_running_loop().run_in_executor(None, allStored.wait, 60)
+        daemonTask.cancel()
+        try:
+            await daemonTask
+        except asyncio.CancelledError:
+            pass
+
+    threading.Thread(target=deliver, daemon=True).start()
+    asyncio.run(run())
+
+    missing = [title for title in titles if title not in stored]
+    latencies = sorted(stored[title] - delivered[title] for title in titles if title in stored)
+    print('%d emails delivered, %d stored, %d logins' % (len(emails), len(latencies), M.loginCount))
+    print('delivery to storage: median %7.1f ms, 90th percentile %7.1f ms, max %7.1f ms'
+          % (1000 * statistics.median(latencies), 1000 * latencies[int(0.9 * (len(latencies) - 1))], 1000 * latencies[-1]))
+    if missing:
+        print('Never stored: %s' % ', '.join(missing))
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main(*(int(i) for i in sys.argv[1:])))
@@ -0,0 +1,60 @@
+#!/usr/bin/env python3
+
+# Checks how fast the daemon's hand-written IDLE (the one used before Python 3.14)
+# notices new mail, against a real socket: an EXISTS in the same packet as the
+# "+ idling" continuation, an EXISTS that arrives later, no mail at all, and an
+# EXISTS imaplib already stored from SELECT (which needs no IDLE). Prints how long
+# each wait took and exits 1 when one returns the wrong answer or is too slow.
+#   python benchmarks/benchIdleWait.py [timeoutSeconds]
+import imaplib
+import sys
+import time
+
+from imapSocketStandIn import IMAPSocketStandIn
+import repositoryPath
+
+from ramafood import daemon
+
+# (name, IDLE script, whether there is new mail, whether EXISTS from SELECT is kept)
+scenarios = (
+    ('EXISTS with the continuation', ((0, b'+ idling\r\n* 4 EXISTS\r\n'),), True, False),
+    ('EXISTS 0.3 s later', ((0, b'+ idling\r\n'), (0.3, b'* 4 EXISTS\r\n')), True, False),
+    ('other responses, then EXISTS', ((0, b'+ idling\r\n* 3 RECENT\r\n'), (0.2, b'* 1 FETCH (FLAGS (\\Seen))\r\n* 4 EXISTS\r\n')), True, False),
+    ('no new mail', ((0, b'+ idling\r\n'),), False, False),
+    ('EXISTS stored from SELECT', ((0, b'+ idling\r\n'),), True, True),
+)
+
+
+def main(timeout=3.0):
+    timeout = float(timeout)
+    failures = 0
+    for name, script, expected, keepSelectExists in scenarios:
+        standIn = IMAPSocketStandIn(script)
+        M = imaplib.IMAP4('127.0.0.1', standIn.port)
+        M.login('student@ramapo.edu', 'password')
+        M.select('dataOther')
+        if not keepSelectExists:
+            M.response('EXISTS')
+
+        started = time.perf_counter()
+        newMail = daemon.waitForNewMail(M, timeout) if keepSelectExists else daemon.idleByHand(M, timeout)
+        elapsed = time.perf_counter() - started
+        # The session must still work after IDLE
+        typ, data = M.noop()
+        M.logout()
+        standIn.close()
+
+        # Without new mail the wait should last the whole timeout, with it well under a second
+        tooSlow = elapsed > 1.0 if expected else elapsed < timeout - 0.1
+        ok = newMail == expected and not tooSlow and typ == 'OK'
+        failures += not ok
+        print('%-30s new mail %-5s in %6.3f s, %d IDLE commands  %s' % (name, newMail, elapsed, standIn.idleCount, 'ok' if ok else 'WRONG'))
+
+    if failures:
+        print('%d waits went wrong' % failures)
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main(*sys.argv[1:]))
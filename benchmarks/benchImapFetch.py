@@ -0,0 +1,71 @@
+#!/usr/bin/env python3
+
+# Measures fetch throughput in messages/sec against the IMAP stand-in: one FETCH
+# per message (the old loop) versus chunked message-set FETCHes. The chunked fetch
+# is also run by UID and against a server that sends the UID and RFC822.SIZE
+# after the header literal, and must return the same messages every time, with
+# a message over the size limit skipped.
+#   python benchmarks/benchImapFetch.py [numberOfMessages] [roundTripMilliseconds] [chunkSize]
+import sys
+import time
+
+from corpus import makeDigestEmails
+from imapStandIn import IMAPStandIn
+import repositoryPath
+
+from ramafood import imap
+
+
+def fetchOneByOne(M):
+    typ, data = M.search(None, '(UNSEEN)')
+    for num in data[0].split():
+        typ, data = M.fetch(num, '(RFC822)')
+        yield int(num), data[0][1]
+
+
+def chunkedFetch(M, chunkSize):
+    typ, data = M.search(None, '(UNSEEN)')
+    for num, route, rawMessage in imap.fetchMessages(M, data[0].split(), chunkSize):
+        yield num, rawMessage
+
+
+# With byUid, the UIDs are turned back into message numbers to compare
+def chunkedUidFetch(M, chunkSize, maxMessageSize):
+    typ, data = M.uid('SEARCH', None, 'UID 1:*')
+    for uid, route, rawMessage in imap.fetchMessages(M, data[0].split(), chunkSize, maxMessageSize, useUid=True):
+        yield M.uids.index(uid) + 1, rawMessage
+
+
+def timeFetch(name, messages, roundTripDelay, fetcher, itemsAfterLiteral=False):
+    M = IMAPStandIn(messages, roundTripDelay, itemsAfterLiteral=itemsAfterLiteral)
+    started = time.perf_counter()
+    fetched = [num for num, rawMessage in fetcher(M)]
+    elapsed = time.perf_counter() - started
+    print('%-20s: %4d messages, %4d round trips, %8.3f s  (%8.1f messages/sec)' % (name, len(fetched), M.commandCount, elapsed, len(fetched) / elapsed))
+    return fetched
+
+
+def main(numberOfMessages=300, roundTripMilliseconds=20, chunkSize=200):
+    messages = makeDigestEmails(numberOfMessages)
+    roundTripDelay = roundTripMilliseconds / 1000
+
+    oneByOne = timeFetch('one FETCH per message', messages, roundTripDelay, fetchOneByOne)
+    chunked = timeFetch('chunked FETCH', messages, roundTripDelay, lambda M: chunkedFetch(M, chunkSize))
+    if oneByOne != chunked:
+        print('The chunked fetch returned different messages')
+        return 1
+
+    # The biggest message is over the limit
+    maxMessageSize = max(len(i) for i in messages) - 1
+    expected = [num for num in oneByOne if len(messages[num - 1]) <= maxMessageSize]
+    for itemsAfterLiteral in (False, True):
+        name = 'by UID, items %s' % ('after' if itemsAfterLiteral else 'before')
+        byUid = timeFetch(name, messages, roundTripDelay, lambda M: chunkedUidFetch(M, chunkSize, maxMessageSize), itemsAfterLiteral)
+        if byUid != expected:
+            print('The chunked fetch by UID with the items %s the literal returned different messages' % ('after' if itemsAfterLiteral else 'before'))
+            return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main(*(int(i) for i in sys.argv[1:])))
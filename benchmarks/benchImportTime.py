@@ -0,0 +1,45 @@
+#!/usr/bin/env python3
+
+# Measures how long importing each part of ramafood takes in a fresh interpreter
+# (python -X importtime), and which of the heavy dependencies each one pulls in.
+# The parsing modules are what a parser process or a test imports, so they must
+# stay free of pymongo, imaplib and the date and HTML libraries until those are used.
+# The last line imports every dependency the single email.py script used to import
+# at the top, for comparison.
+#   python benchmarks/benchImportTime.py [repeats]
+import subprocess
+import sys
+
+import repositoryPath
+
+heavyModules = ('pymongo', 'imaplib', 'parsedatetime', 'html2text', 'datefinder', 'pytz', 'numpy')
+oldScriptImports = 'imaplib, html2text, parsedatetime, pytz, datefinder, pymongo, configparser'
+
+measureCode = '''
+import sys, time
+started = time.perf_counter()
+import %s
+elapsed = time.perf_counter() - started
+print(elapsed, ' '.join(i for i in %r if i in sys.modules))
+'''
+
+
+def timeImport(modules, repeats):
+    times = []
+    for i in range(repeats):
+        output = subprocess.run([sys.executable, '-c', measureCode % (modules, heavyModules)], cwd=repositoryPath.repositoryRoot,
+                                capture_output=True, text=True, check=True).stdout.split(' ', 1)
+        times.append(float(output[0]))
+    return min(times), output[1].strip()
+
+
+def main(repeats=5):
+    for modules in ('ramafood', 'ramafood.events', 'ramafood.parsers', 'ramafood.pipeline', 'ramafood.dedup', 'ramafood.foodmodel', 'ramafood.cli',
+                    'ramafood.imap, ramafood.storage, ramafood.daemon', oldScriptImports):
+        seconds, loaded = timeImport(modules, repeats)
+        print('%-50s %8.1f ms   %s' % (modules[:50], seconds * 1000, loaded or '-'))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main(*(int(i) for i in sys.argv[1:])))
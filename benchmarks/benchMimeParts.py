@@ -0,0 +1,77 @@
+#!/usr/bin/env python3
+
+# Compares text extraction on attachment-heavy emails (an HTML body and two
+# attachments, no text/plain part) with the old way: the whole message decoded
+# to str as UTF-8, then every part of it decoded in the second pass of walk().
+# Reports time and peak memory, and how many emails each way gets text out of.
+#   python benchmarks/benchMimeParts.py [numberOfEmails] [attachmentKilobytes]
+import email
+import sys
+import time
+import tracemalloc
+
+from corpus import makeAttachmentEmails
+import repositoryPath
+
+from ramafood import parsers, text
+
+
+def legacyTextParts(msg):
+    plainTextCount = 0
+    for part in msg.walk():
+        try:
+            if part.get_content_type() == "text/plain":
+                body = part.get_payload(decode=True).decode()
+                plainTextCount += 1
+                yield body
+        except UnicodeDecodeError:
+            continue
+
+    if plainTextCount == 0:
+        for part in msg.walk():
+            try:
+                body = part.get_payload(decode=True)
+                if body != None:
+                    yield text.htmlToText(body.decode())
+            except UnicodeDecodeError:
+                continue
+
+
+def legacyExtract(rawMessage):
+    try:
+        return list(legacyTextParts(email.message_from_string(rawMessage.decode('utf-8'))))
+    except UnicodeDecodeError:
+        return []
+
+
+def extract(rawMessage):
+    return list(parsers.textParts(email.message_from_bytes(rawMessage)))
+
+
+# Time and memory are measured in separate runs, as tracemalloc slows everything down
+def measure(name, emails, extractor):
+    started = time.perf_counter()
+    withText = sum(1 for rawMessage in emails if any('Ramapo' in i for i in extractor(rawMessage)))
+    elapsed = time.perf_counter() - started
+
+    tracemalloc.start()
+    for rawMessage in emails:
+        extractor(rawMessage)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    print('%-22s %8.1f ms  peak %7.1f MB  text found in %d of %d emails' % (name, elapsed * 1000, peak / 2 ** 20, withText, len(emails)))
+    return elapsed
+
+
+def main(numberOfEmails=20, attachmentKilobytes=1024):
+    emails = makeAttachmentEmails(numberOfEmails, attachmentKilobytes * 1024)
+    text.htmlToText('<p>warm up</p>')
+
+    legacyTime = measure('decode every part', emails, legacyExtract)
+    newTime = measure('text parts only', emails, extract)
+    print('speedup %.2fx' % (legacyTime / newTime))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main(*(int(i) for i in sys.argv[1:])))
@@ -0,0 +1,124 @@
+#!/usr/bin/env python3
+
+# Measures reading several mailboxes (club accounts) against IMAP stand-ins with a
+# network delay: one at a time, as one script per mailbox would, and concurrently
+# through the session pool. Prints the per-source throughput report of each run,
+# and checks that both runs find the same events and checkpoint every source.
+# Then checks a source read for the first time with a checkpoint store: only its
+# UNSEEN messages are read, later runs read only what arrived since, and all of
+# it is read again when its UIDVALIDITY changes. Last, reads one source with a
+# rate limit, with chunks bigger than the limit, and checks that by every download
+# no more than rateLimit messages a second (plus one second's worth) were
+# downloaded since the first.
+#   python benchmarks/benchMultiMailbox.py [numberOfSources] [messagesPerSource] [roundTripMilliseconds] [maxSessions] [rateLimit]
+import email
+import sys
+import time
+
+from corpus import makeCorpus
+from imapStandIn import IMAPStandIn
+import repositoryPath
+
+from ramafood import imap, sources
+
+
+def readAll(mailboxSources, messages, roundTripDelay, maxSessions, chunkSize, standIns=None):
+    if standIns == None:
+        standIns = dict()
+    standIns.update((source['emailAddress'], IMAPStandIn(messages, roundTripDelay)) for source in mailboxSources)
+
+    def connect(source):
+        M = standIns[source['emailAddress']]
+        M.login(source['emailAddress'], source['password'])
+        M.select(source['mailbox'])
+        return M
+
+    store = imap.openCheckpointStore(':memory:')
+    checkpoints = []
+    throughput = dict()
+    started = time.perf_counter()
+    events = list(sources.performSourceOperations(mailboxSources, chunkSize, checkpointStore=store, maxSessions=maxSessions,
+                                                  checkpoints=checkpoints, throughput=throughput, connect=connect))
+    elapsed = time.perf_counter() - started
+    print('%d sessions at most: %d events in %.2f s' % (maxSessions, len(events), elapsed))
+    print(sources.throughputReport(throughput))
+    print()
+    return events, checkpoints, elapsed
+
+
+# How many messages the downloads got ahead of perSecond a second, at most
+def mostAheadOfRate(downloadTimes, perSecond):
+    return max(count - perSecond * (i - downloadTimes[0]) for count, i in enumerate(downloadTimes, 1))
+
+
+# How many messages each of three runs over one source reads: without a saved
+# checkpoint and with the first half of the messages seen, after one new message,
+# and after one more and a new UIDVALIDITY
+def checkpointRuns(messages):
+    M = IMAPStandIn(messages)
+    M.seen.update(range(1, len(messages) // 2 + 1))
+    source = sources.mailboxSource('club', 'club@ramapo.edu', 'secret', 'dataOther')
+
+    def connect(source):
+        M.login(source['emailAddress'], source['password'])
+        M.select(source['mailbox'])
+        return M
+
+    store = imap.openCheckpointStore(':memory:')
+    read = []
+    for run in range(3):
+        checkpoints = []
+        throughput = dict()
+        list(sources.performSourceOperations([source], checkpointStore=store, checkpoints=checkpoints, throughput=throughput, connect=connect))
+        for checkpoint in checkpoints:
+            imap.saveCheckpoint(store, *checkpoint)
+        read.append(throughput['club']['messages'])
+        M.append(messages[-1])
+        if run == 1:
+            M.uidValidity += 1
+    return read
+
+
+def main(numberOfSources=6, messagesPerSource=60, roundTripMilliseconds=50, maxSessions=4, rateLimit=10):
+    messages = makeCorpus(messagesPerSource // 4)
+    mailboxSources = [sources.mailboxSource('club%d' % i, 'club%d@ramapo.edu' % i, 'secret', 'dataOther') for i in range(numberOfSources)]
+    roundTripDelay = roundTripMilliseconds / 1000
+
+    # Small chunks, so that there are many round trips to overlap
+    oneAtATime, oneAtATimeCheckpoints, oneAtATimeTime = readAll(mailboxSources, messages, roundTripDelay, 1, 10)
+    pooled, pooledCheckpoints, pooledTime = readAll(mailboxSources, messages, roundTripDelay, maxSessions, 10)
+
+    def eventKeys(events):
+        return sorted((i.title, i.displayDate(), i.eventDetails) for i in events)
+
+    if eventKeys(oneAtATime) != eventKeys(pooled) or sorted(oneAtATimeCheckpoints) != sorted(pooledCheckpoints) or len(pooledCheckpoints) != numberOfSources:
+        print('The concurrent read found other events or checkpoints')
+        return 1
+    print('speedup: %.2fx' % (oneAtATimeTime / pooledTime))
+    print()
+
+    # Every message of the corpus is parsed (none is skipped), so the counts are exact
+    parsed = [i for i in messages if sources.routeEmail(email.message_from_bytes(i)) != None]
+    read = checkpointRuns(parsed)
+    expected = [len(parsed) - len(parsed) // 2, 1, len(parsed) + 2]
+    print('checkpoint runs: %s messages read, %s expected' % (read, expected))
+    if read != expected:
+        print('The checkpoint runs read the wrong messages')
+        return 1
+    print()
+
+    limited = sources.mailboxSource('limited', 'limited@ramapo.edu', 'secret', 'dataOther', rateLimit)
+    standIns = dict()
+    events, checkpoints, elapsed = readAll([limited], messages, roundTripDelay, 1, 200, standIns)
+    downloadTimes = standIns[limited['emailAddress']].downloadTimes
+    ahead = mostAheadOfRate(downloadTimes, rateLimit)
+    print('rate limit %d messages/s: %d messages in %.2f s, at most %.1f messages ahead of the rate' % (
+        rateLimit, len(downloadTimes), downloadTimes[-1] - downloadTimes[0], ahead))
+    if ahead > rateLimit + 0.01:
+        print('The rate limited source downloaded too fast')
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main(*(int(i) for i in sys.argv[1:])))
@@ -0,0 +1,48 @@
+#!/usr/bin/env python3
+
+# Parses a backlog of Daily Digest emails with 1, 2, 4, ... worker processes and
+# reports messages/sec and the speedup over one worker. Also checks that every
+# worker count produces the same events in the same order.
+#   python benchmarks/benchParallelParse.py [numberOfMessages] [maxWorkers]
+import os
+import sys
+import time
+
+from corpus import makeDigestEmails
+import repositoryPath
+
+from ramafood import pipeline
+
+
+# parsedatetime fills in the current time of day when a date has none, so two runs
+# are compared on the day of each event only
+def comparable(results):
+    return [(num, [(i.title, i.displayDate()[:10], i.eventDetails) for i in events]) for num, events in results]
+
+
+def main(numberOfMessages=200, maxWorkers=os.cpu_count()):
+    messages = [(num, 'digest', rawMessage) for num, rawMessage in enumerate(makeDigestEmails(numberOfMessages), 1)]
+
+    workerCounts = [1]
+    while workerCounts[-1] * 2 <= maxWorkers:
+        workerCounts.append(workerCounts[-1] * 2)
+
+    baseline = None
+    for workers in workerCounts:
+        started = time.perf_counter()
+        results = list(pipeline.parseMessages(messages, workers))
+        elapsed = time.perf_counter() - started
+
+        if baseline == None:
+            baseline = (comparable(results), elapsed)
+        elif comparable(results) != baseline[0]:
+            print('%d workers produced different events than 1 worker' % workers)
+            return 1
+
+        eventCount = sum(len(events) for num, events in results)
+        print('%2d workers: %8.3f s  (%7.1f messages/sec, %5d events, %5.2fx)' % (workers, elapsed, len(messages) / elapsed, eventCount, baseline[1] / elapsed))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main(*(int(i) for i in sys.argv[1:])))
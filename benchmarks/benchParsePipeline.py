@@ -0,0 +1,76 @@
+#!/usr/bin/env python3
+
+# Offline benchmark of the parsing pipeline on a synthetic corpus of Daily Digest,
+# CSI Weekend Edition, free-form and Public Safety emails. Writes the corpus to an
+# mbox in a temporary directory, replays it and reports the time spent in each
+# stage (read -> route -> text parts -> parse) and events/sec per email type. No network
+# or MongoDB is needed, so the numbers are a reproducible baseline.
+#   python benchmarks/benchParsePipeline.py [numberOfDigests]
+import email
+import os
+import sys
+import tempfile
+import time
+from collections import defaultdict
+from email.parser import BytesHeaderParser
+
+from corpus import makeCorpus, writeMbox
+import repositoryPath
+
+from ramafood import parsers, pipeline
+
+
+def timed(timings, stage, function, *args):
+    started = time.perf_counter()
+    result = function(*args)
+    timings[stage] += time.perf_counter() - started
+    return result
+
+
+def main(numberOfDigests=40):
+    corpus = makeCorpus(numberOfDigests)
+    timings = defaultdict(float)
+    messageCounts = defaultdict(int)
+    eventCounts = defaultdict(int)
+    headerParser = BytesHeaderParser()
+
+    with tempfile.TemporaryDirectory() as directory:
+        mboxPath = os.path.join(directory, 'corpus.mbox')
+        writeMbox(mboxPath, corpus)
+
+        started = time.perf_counter()
+        rawMessages = list(pipeline.readMessageFiles([mboxPath]))
+        timings['read'] = time.perf_counter() - started
+
+    for rawMessage in rawMessages:
+        route = timed(timings, 'route', lambda: parsers.routeEmail(headerParser.parsebytes(rawMessage)))
+        if route == None:
+            messageCounts['skipped'] += 1
+            continue
+
+        routeName = route[0]
+        msg = email.message_from_bytes(rawMessage)
+        timed(timings, 'text parts', lambda: list(parsers.textParts(msg)))
+        events = timed(timings, 'parse ' + routeName, parsers.parseRawMessage, routeName, rawMessage)
+        messageCounts[routeName] += 1
+        eventCounts[routeName] += len(events)
+
+    print('%d emails (%s)' % (len(rawMessages), ', '.join('%d %s' % (messageCounts[i], i) for i in sorted(messageCounts))))
+    print('%-18s %10s' % ('stage', 'ms'))
+    for stage in ('read', 'route', 'text parts'):
+        print('%-18s %10.2f' % (stage, timings[stage] * 1000))
+
+    totalEvents = 0
+    totalParseTime = 0
+    for routeName in sorted(eventCounts):
+        parseTime = timings['parse ' + routeName]
+        totalEvents += eventCounts[routeName]
+        totalParseTime += parseTime
+        print('%-18s %10.2f   %5d events  %8.1f events/sec' % ('parse ' + routeName, parseTime * 1000, eventCounts[routeName], eventCounts[routeName] / parseTime))
+
+    print('%-18s %10.2f   %5d events  %8.1f events/sec' % ('parse total', totalParseTime * 1000, totalEvents, totalEvents / totalParseTime))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main(*(int(i) for i in sys.argv[1:])))
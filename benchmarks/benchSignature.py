@@ -0,0 +1,83 @@
+#!/usr/bin/env python3
+
+# Compares removeSignature with the old version (13 str.find scans and 4 regex
+# searches over the whole body, every time) on free-form emails, on long quoted
+# reply chains and on bodies full of "On ..." that never say "wrote". Checks that
+# both cut the free-form emails at the same place.
+#   python benchmarks/benchSignature.py [numberOfEmails] [repliesPerThread] [repeats]
+import email
+import random
+import re
+import sys
+import timeit
+
+from corpus import makeOtherEmails, makeParagraph
+import repositoryPath
+
+from ramafood import text
+
+
+def legacyRemoveSignature(body):
+    signatureStartIndex = []
+    signatureFormats = ('-----Original Message-----', 'Sent from my iPhone', "Thank you,", "Thanks,", "Thank You,",
+                        "Best,", "Regards", 'Sincerely,', 60 * "=", '505 Ramapo Valley Road', '505 Ramapo Valley Rd',
+                        "Forward email", "Best wishes")
+    for i in signatureFormats:
+        index = body.find(i)
+        if index != -1:
+            signatureStartIndex.append(index)
+
+    regexSignaturePatterns = (r'On\W+(?:\w+\W+){11,15}?wrote', r'Fwd:\b', r"(\n| |\r|\*)--( ){0,1}(\n|\r)",
+                              r'(\n|\r| )________________________________(\n|\r)')
+    for aPattern in regexSignaturePatterns:
+        searched = re.search(aPattern, body)
+        if searched != None:
+            signatureStartIndex.append(searched.span()[0])
+
+    if len(signatureStartIndex) > 0:
+        body = body[:min(signatureStartIndex)-1]
+    return body
+
+
+def emailBodies(count):
+    return [email.message_from_bytes(raw).get_payload() for raw in makeOtherEmails(count)]
+
+
+# An announcement followed by a long chain of quoted replies, the signature at the very end
+def makeReplyThread(rng, replies):
+    parts = ['Hi everyone,\n\n%s\n' % makeParagraph(rng, True)]
+    for i in range(replies):
+        parts.append('\nOn Mon, Oct %d, 2018 at 9:00 AM Jordan Lee <jlee@ramapo.edu> wrote:\n> %s\n' % (i % 28 + 1, makeParagraph(rng, False)))
+    parts.append('\nThanks,\nJordan Lee\n')
+    return ''.join(parts)
+
+
+# A long body where every sentence starts with "On" but no reply marker ever follows
+def makeOnWithoutWrote(rng, sentences):
+    return ' '.join('On %s' % makeParagraph(rng, False) for i in range(sentences))
+
+
+def timeBoth(name, bodies, repeats):
+    legacyTime = min(timeit.repeat(lambda: [legacyRemoveSignature(i) for i in bodies], number=1, repeat=repeats))
+    newTime = min(timeit.repeat(lambda: [text.removeSignature(i) for i in bodies], number=1, repeat=repeats))
+    size = sum(len(i) for i in bodies)
+    print('%-26s %7d KB  old %9.2f ms  new %9.2f ms  speedup %7.2fx' % (name, size // 1024, legacyTime * 1000, newTime * 1000, legacyTime / newTime))
+
+
+def main(numberOfEmails=500, repliesPerThread=200, repeats=3):
+    rng = random.Random(364)
+    bodies = emailBodies(numberOfEmails)
+
+    disagreements = [i for i in bodies if legacyRemoveSignature(i) != text.removeSignature(i)]
+    if disagreements:
+        print('removeSignature disagrees with the old version on %d emails' % len(disagreements))
+        return 1
+
+    timeBoth('free-form emails', bodies, repeats)
+    timeBoth('long reply chains', [makeReplyThread(rng, repliesPerThread) for i in range(20)], repeats)
+    timeBoth('"On" without "wrote"', [makeOnWithoutWrote(rng, repliesPerThread) for i in range(20)], repeats)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main(*(int(i) for i in sys.argv[1:])))
@@ -0,0 +1,175 @@
+# Synthetic, deterministic paragraphs that look like Ramapo Daily Digest entries.
+# A mix of food events, paid events and events with no food at all, so that both
+# the hit and the miss paths of the parser get exercised.
+import mailbox
+import os
+import random
+from email.message import EmailMessage
+
+foodSentences = (
+    'Free pizza and drinks will be provided for all attendees.',
+    'Come enjoy some delicious Nepali food with us!',
+    'Refreshments will be served after the talk.',
+    'Bagels and coffee in the Trustees Pavilion.',
+    "There will be free food from Moe's.",
+    'We will have momos, dumplings and dessert.',
+)
+
+plainSentences = (
+    'Join the Career Development Center for a resume workshop.',
+    'The library will be open until midnight during finals week.',
+    'Please bring your Ramapo ID card to check in at the front desk.',
+    'All majors are welcome and no registration is required for this session.',
+    'Contact the Office of Student Involvement with any questions.',
+    'Students will learn how to prepare for interviews with local employers.',
+    'Tickets are $15 at the box office in the Berrie Center.',
+)
+
+dateSentences = (
+    'Wednesday, October 5 from 7 to 9 pm in the Friends Hall.',
+    'Thursday 3/27 at noon, Student Center room 219.',
+    'Tonight at 8 pm in the Bradley Center.',
+    'Nov. 12th, 2018 at 6 pm in Sharp Sprain Room.',
+)
+
+
+def makeParagraph(rng, withFood):
+    sentences = [rng.choice(dateSentences)]
+    sentences.extend(rng.choice(plainSentences) for i in range(rng.randint(3, 8)))
+    if withFood:
+        sentences.insert(rng.randint(1, len(sentences)), rng.choice(foodSentences))
+    return ' '.join(sentences)
+
+
+# Returns a list of paragraphs. About foodRatio of them mention food.
+def makeDigestParagraphs(count, foodRatio=0.3, seed=364):
+    rng = random.Random(seed)
+    return [makeParagraph(rng, rng.random() < foodRatio) for i in range(count)]
+
+
+# Returns count raw Daily Digest emails (bytes) with paragraphsPerEmail entries each,
+# laid out like the real digest: entries separated by 60 dashes, title on the
+# second line of each entry.
+def makeDigestEmails(count, paragraphsPerEmail=20, seed=364):
+    rng = random.Random(seed)
+    emails = []
+    for i in range(count):
+        entries = ['Ramapo College Daily Digest', 'Today\'s announcements']
+        for j in range(paragraphsPerEmail):
+            entries.append('\nEvent %d-%d\n%s\n' % (i, j, makeParagraph(rng, rng.random() < 0.3)))
+        entries.append('You are receiving this email because you are a Ramapo student.')
+
+        emails.append(makeEmail('Ramapo Daily Digest <digest@ramapo.edu>', 'Daily Digest %d' % i, (60 * '-').join(entries)))
+    return emails
+
+
+def makeEmail(sender, subject, body):
+    msg = EmailMessage()
+    msg['From'] = sender
+    msg['Subject'] = subject
+    msg['Date'] = 'Mon, 1 Oct 2018 08:00:00 -0400'
+    msg.set_content(body)
+    return bytes(msg)
+
+
+weekendDays = ('Friday', 'Saturday', 'Sunday')
+weekendMonths = ('September', 'October', 'November')
+
+# Returns count raw CSI Weekend Edition emails. Every paragraph is one line that
+# starts with a capital letter: 3 header paragraphs, eventsPerEmail events that
+# name their date as "<day> <Month> <number>", then 7 footer paragraphs. The
+# router's subject regexes want 2 to 4 non-lowercase characters between words.
+def makeWeekendEmails(count, eventsPerEmail=8, seed=364):
+    rng = random.Random(seed)
+    emails = []
+    for i in range(count):
+        paragraphs = ['CSI Weekend Edition', 'Center for Student Involvement', 'Here is what is happening this weekend!']
+        for j in range(eventsPerEmail):
+            date = '%s %s %d' % (rng.choice(weekendDays), rng.choice(weekendMonths), rng.randint(1, 28))
+            paragraphs.append('Weekend event %d-%d on %s. %s' % (i, j, date, makeParagraph(rng, rng.random() < 0.5)))
+        paragraphs.extend('Footer line %d of the CSI newsletter.' % k for k in range(7))
+        emails.append(makeEmail('Center for Student Involvement <csi@ramapo.edu>', 'CSI Weekend | Edition %d' % i, '\n'.join(paragraphs)))
+    return emails
+
+
+signatures = (
+    'Thanks,\nJordan Lee\nResidence Life\n505 Ramapo Valley Road',
+    'Best,\nSam Patel\nSent from my iPhone',
+    'Regards\nThe Nepali Student Association',
+)
+
+# Returns count raw free-form emails from clubs and residence halls, with a
+# signature and, for some of them, a quoted reply chain below it.
+def makeOtherEmails(count, seed=364):
+    rng = random.Random(seed)
+    emails = []
+    for i in range(count):
+        body = 'Hi everyone,\n\n%s\n\n%s\n' % (makeParagraph(rng, rng.random() < 0.6), rng.choice(signatures))
+        if rng.random() < 0.3:
+            body += '\nOn Mon, Oct 1, 2018 at 9:00 AM Jordan Lee <jlee@ramapo.edu> wrote:\n> %s\n' % makeParagraph(rng, True)
+        emails.append(makeEmail('Club Officer <club%d@ramapo.edu>' % (i % 10), 'Club meeting %d' % i, body))
+    return emails
+
+
+# Returns count Public Safety newsletters. The router skips these.
+def makeNewsletterEmails(count):
+    return [makeEmail('Public Safety <safety@ramapo.edu>', 'Public | Safety | Newsletter %d' % i, 'Stay safe on campus.') for i in range(count)]
+
+
+# A mixed corpus in a fixed order: for every digest there is one Weekend Edition,
+# two free-form emails and, every fourth time, a Public Safety newsletter.
+def makeCorpus(numberOfDigests, seed=364):
+    digests = makeDigestEmails(numberOfDigests, seed=seed)
+    weekend = makeWeekendEmails(numberOfDigests, seed=seed)
+    other = makeOtherEmails(2 * numberOfDigests, seed=seed)
+    newsletters = makeNewsletterEmails(numberOfDigests)
+
+    emails = []
+    for i in range(numberOfDigests):
+        emails.extend((digests[i], weekend[i], other[2 * i], other[2 * i + 1]))
+        if i % 4 == 0:
+            emails.append(newsletters[i])
+    return emails
+
+
+def writeMbox(path, emails):
+    mbox = mailbox.mbox(path)
+    for rawMessage in emails:
+        mbox.add(rawMessage)
+    mbox.close()
+
+
+# Keys of a Maildir don't keep the order messages were added in, so the replay
+# sorts them. Setting the names here keeps that order equal to the corpus order.
+def writeMaildir(path, emails):
+    maildir = mailbox.Maildir(path)
+    for num, rawMessage in enumerate(emails):
+        with open(os.path.join(path, 'new', '%08d.corpus' % num), 'wb') as messageFile:
+            messageFile.write(rawMessage)
+    return maildir
+
+
+def writeEmlDirectory(path, emails):
+    os.makedirs(path, exist_ok=True)
+    for num, rawMessage in enumerate(emails):
+        with open(os.path.join(path, '%08d.eml' % num), 'wb') as emlFile:
+            emlFile.write(rawMessage)
+
+
+# Returns count raw emails with an HTML body only (no text/plain part) and two
+# attachments of attachmentSize random bytes each: a PNG and a PDF. Every fourth
+# one is in ISO-8859-1.
+def makeAttachmentEmails(count, attachmentSize=1024 * 1024, seed=364):
+    rng = random.Random(seed)
+    emails = []
+    for i in range(count):
+        msg = EmailMessage()
+        msg['From'] = 'Club Officer <club%d@ramapo.edu>' % (i % 10)
+        msg['Subject'] = 'Flyer for event %d' % i
+        msg['Date'] = 'Mon, 1 Oct 2018 08:00:00 -0400'
+        html = '<html><body><p>Hi everyone,</p><p>%s</p><p>Caf\xe9 Ramapo</p></body></html>' % makeParagraph(rng, True)
+        msg.set_content(html, subtype='html', charset='iso-8859-1' if i % 4 == 0 else 'utf-8')
+        msg.add_attachment(rng.randbytes(attachmentSize), maintype='image', subtype='png', filename='flyer.png')
+        msg.add_attachment(rng.randbytes(attachmentSize), maintype='application', subtype='pdf', filename='flyer.pdf')
+        emails.append(bytes(msg))
+    return emails
@@ -0,0 +1,81 @@
+# A socket-level IMAP server for the code paths that talk to imaplib's socket
+# directly, which the in-process stand-in (imapStandIn.py) skips: imaplib.IMAP4
+# connects to it over TCP on localhost. It answers CAPABILITY, LOGIN, SELECT,
+# NOOP and LOGOUT, and plays idleScript after IDLE: (delay in seconds, bytes to
+# send) pairs, each sent in one write, until the client sends DONE. The first
+# pair should send the "+ idling" continuation.
+import socket
+import threading
+
+
+class IMAPSocketStandIn:
+    def __init__(self, idleScript, messageCount=3, uidValidity=1):
+        self.idleScript = idleScript
+        self.messageCount = messageCount
+        self.uidValidity = uidValidity
+        self.idleCount = 0
+        self.server = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self.server.bind(('127.0.0.1', 0))
+        self.server.listen(1)
+        self.port = self.server.getsockname()[1]
+        threading.Thread(target=self.serve, daemon=True).start()
+
+    def serve(self):
+        while True:
+            try:
+                connection, address = self.server.accept()
+            except OSError:
+                return
+            threading.Thread(target=self.session, args=(connection,), daemon=True).start()
+
+    def session(self, connection):
+        reader = connection.makefile('rb')
+        connection.sendall(b'* OK IMAP4rev1 stand-in ready\r\n')
+        for line in reader:
+            tag, command = line.split(b' ', 2)[:2]
+            command = command.strip().upper()
+            if command == b'CAPABILITY':
+                connection.sendall(b'* CAPABILITY IMAP4rev1 IDLE\r\n%s OK CAPABILITY completed\r\n' % tag)
+            elif command in (b'LOGIN', b'NOOP'):
+                connection.sendall(b'%s OK %s completed\r\n' % (tag, command))
+            elif command == b'SELECT':
+                connection.sendall(b'* %d EXISTS\r\n* OK [UIDVALIDITY %d] UIDs valid\r\n%s OK [READ-WRITE] SELECT completed\r\n' % (
+                    self.messageCount, self.uidValidity, tag))
+            elif command == b'IDLE':
+                self.idleCount += 1
+                self.idle(connection, reader, tag)
+            elif command == b'LOGOUT':
+                connection.sendall(b'* BYE logging out\r\n%s OK LOGOUT completed\r\n' % tag)
+                break
+            else:
+                connection.sendall(b'%s BAD unknown command\r\n' % tag)
+        connection.close()
+
+    # Plays idleScript on another thread while this one waits for DONE
+    def idle(self, connection, reader, tag):
+        sendLock = threading.Lock()
+        done = threading.Event()
+
+        def play():
+            for delay, data in self.idleScript:
+                if done.wait(delay):
+                    return
+                with sendLock:
+                    if done.is_set():
+                        return
+                    connection.sendall(data)
+
+        player = threading.Thread(target=play, daemon=True)
+        player.start()
+        line = reader.readline()
+        with sendLock:
+            done.set()
+        if line.strip().upper() == b'DONE':
+            connection.sendall(b'%s OK IDLE terminated\r\n' % tag)
+        else:
+            connection.sendall(b'%s BAD expected DONE\r\n' % tag)
+        player.join()
+
+    def close(self):
+        self.server.close()
+
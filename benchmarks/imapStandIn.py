@@ -0,0 +1,187 @@
+# An in-process stand-in for imaplib.IMAP4_SSL. It holds a list of raw messages,
+# answers the commands ramafood uses in the same shapes imaplib returns, and
+# sleeps roundTripDelay seconds per command to model network latency.
+# Message n (counting from 1) has the UID firstUid + n - 1. Messages can be
+# appended from another thread while a client waits in IDLE, and
+# dropConnection() makes the next command fail the way a dead socket does.
+# downloadTimes has the time.monotonic() of every message body sent. With
+# itemsAfterLiteral, the UID and RFC822.SIZE of the header FETCH come in the
+# line that closes each message, after the headers, as some servers send them.
+import contextlib
+import email
+import imaplib
+import re
+import threading
+import time
+
+messageSetPattern = re.compile(r'^(\d+|\*)(?::(\d+|\*))?$')
+uidSearchPattern = re.compile(r'^UID (\S+)$')
+
+
+class IMAPStandIn:
+    def __init__(self, messages, roundTripDelay=0.0, uidValidity=1, firstUid=101, itemsAfterLiteral=False):
+        self.messages = list(messages)
+        self.uids = [firstUid + i for i in range(len(self.messages))]
+        self.uidValidity = uidValidity
+        self.seen = set()
+        self.roundTripDelay = roundTripDelay
+        self.commandCount = 0
+        self.downloadTimes = []
+        self.itemsAfterLiteral = itemsAfterLiteral
+        self.loginCount = 0
+        self.dropped = False
+        self.changed = threading.Condition()
+
+    def roundTrip(self):
+        if self.dropped:
+            raise imaplib.IMAP4.abort('connection dropped')
+        self.commandCount += 1
+        if self.roundTripDelay:
+            time.sleep(self.roundTripDelay)
+
+    def append(self, rawMessage):
+        with self.changed:
+            self.messages.append(rawMessage)
+            self.uids.append(self.uids[-1] + 1 if self.uids else 1)
+            self.changed.notify_all()
+
+    def dropConnection(self):
+        with self.changed:
+            self.dropped = True
+            self.changed.notify_all()
+
+    # A new session on the same mailbox
+    def login(self, user, password):
+        self.dropped = False
+        self.loginCount += 1
+        self.roundTrip()
+        return 'OK', [b'LOGIN completed']
+
+    # Like IMAP4.idle in Python 3.14: iterating yields the untagged responses
+    # ('EXISTS', [number of messages]) until duration seconds have passed
+    @contextlib.contextmanager
+    def idle(self, duration=None):
+        self.roundTrip()
+        yield self.idleResponses(len(self.messages), duration)
+
+    def idleResponses(self, knownCount, duration):
+        deadline = time.monotonic() + (duration if duration != None else 29 * 60)
+        while True:
+            with self.changed:
+                self.changed.wait_for(lambda: self.dropped or len(self.messages) > knownCount, max(deadline - time.monotonic(), 0))
+                if self.dropped:
+                    raise imaplib.IMAP4.abort('connection dropped')
+                count = len(self.messages)
+            if count > knownCount:
+                knownCount = count
+                yield 'EXISTS', [str(count).encode()]
+            elif time.monotonic() >= deadline:
+                return
+
+    def select(self, mailbox='INBOX'):
+        self.roundTrip()
+        return 'OK', [str(len(self.messages)).encode()]
+
+    def response(self, code):
+        if code == 'UIDVALIDITY':
+            return code, [str(self.uidValidity).encode()]
+        return code, [None]
+
+    # Message numbers (counting from 1) matching an IMAP message set. With byUid
+    # the set is made of UIDs.
+    def messageNumbers(self, messageSet, byUid=False):
+        if isinstance(messageSet, bytes):
+            messageSet = messageSet.decode()
+
+        keys = self.uids if byUid else list(range(1, len(self.messages) + 1))
+        highest = keys[-1] if keys else 0
+        numbers = []
+        for part in messageSet.split(','):
+            start, end = messageSetPattern.match(part).groups()
+            start = highest if start == '*' else int(start)
+            end = start if end == None else (highest if end == '*' else int(end))
+            low, high = min(start, end), max(start, end)
+            numbers.extend(i + 1 for i, key in enumerate(keys) if low <= key <= high)
+        return numbers
+
+    def search(self, charset, *criteria):
+        self.roundTrip()
+        return 'OK', [' '.join(str(i) for i in self.searchNumbers(criteria)).encode()]
+
+    def searchNumbers(self, criteria):
+        numbers = range(1, len(self.messages) + 1)
+        for criterion in criteria:
+            if criterion == '(UNSEEN)':
+                numbers = [i for i in numbers if i not in self.seen]
+            elif uidSearchPattern.match(criterion):
+                inSet = set(self.messageNumbers(uidSearchPattern.match(criterion).group(1), byUid=True))
+                numbers = [i for i in numbers if i in inSet]
+        return numbers
+
+    def fetch(self, messageSet, items):
+        self.roundTrip()
+        return 'OK', self.fetchNumbers(self.messageNumbers(messageSet), items, withUid=False)
+
+    def fetchNumbers(self, numbers, items, withUid):
+        data = []
+        for num in numbers:
+            raw = self.messages[num - 1]
+            uid = b'UID %d ' % self.uids[num - 1] if withUid else b''
+            if items == '(RFC822.SIZE)':
+                data.append(b'%d (%sRFC822.SIZE %d)' % (num, uid, len(raw)))
+            elif items == '(RFC822.SIZE BODY.PEEK[HEADER.FIELDS (FROM SUBJECT DATE)])':
+                headers = self.headerFields(raw, ('From', 'Subject', 'Date'))
+                if self.itemsAfterLiteral:
+                    data.append((b'%d (BODY[HEADER.FIELDS (FROM SUBJECT DATE)] {%d}' % (num, len(headers)), headers))
+                    data.append(b' %sRFC822.SIZE %d)' % (uid, len(raw)))
+                else:
+                    data.append((b'%d (%sRFC822.SIZE %d BODY[HEADER.FIELDS (FROM SUBJECT DATE)] {%d}' % (num, uid, len(raw), len(headers)), headers))
+                    data.append(b')')
+            elif items == '(RFC822)':
+                self.seen.add(num)
+                self.downloadTimes.append(time.monotonic())
+                data.append((b'%d (%sRFC822 {%d}' % (num, uid, len(raw)), raw))
+                data.append(b')')
+            else:
+                raise NotImplementedError(items)
+        return data
+
+    def headerFields(self, raw, fieldNames):
+        msg = email.message_from_bytes(raw)
+        lines = ['%s: %s\r\n' % (name, msg[name]) for name in fieldNames if msg[name] != None]
+        return (''.join(lines) + '\r\n').encode('utf-8')
+
+    def store(self, messageSet, command, flags):
+        self.roundTrip()
+        self.storeNumbers(self.messageNumbers(messageSet), command, flags)
+        return 'OK', []
+
+    def storeNumbers(self, numbers, command, flags):
+        if command == '+FLAGS' and '\\Seen' in flags:
+            self.seen.update(numbers)
+
+    def uid(self, command, *args):
+        self.roundTrip()
+        command = command.upper()
+        if command == 'SEARCH':
+            numbers = self.searchNumbers(args[1:])
+            return 'OK', [' '.join(str(self.uids[i - 1]) for i in numbers).encode()]
+        if command == 'FETCH':
+            messageSet, items = args
+            return 'OK', self.fetchNumbers(self.messageNumbers(messageSet, byUid=True), items, withUid=True)
+        if command == 'STORE':
+            messageSet, storeCommand, flags = args
+            self.storeNumbers(self.messageNumbers(messageSet, byUid=True), storeCommand, flags)
+            return 'OK', []
+        raise NotImplementedError(command)
+
+    def shutdown(self):
+        self.dropConnection()
+
+    def close(self):
+        self.roundTrip()
+        return 'OK', [b'CLOSE completed']
+
+    def logout(self):
+        self.roundTrip()
+        return 'BYE', [b'LOGOUT completed']
@@ -0,0 +1,8 @@
+# Puts the repository root on sys.path, so that the benchmarks can import the
+# ramafood package when they are run as scripts from anywhere
+import os
+import sys
+
+repositoryRoot = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if repositoryRoot not in sys.path:
+    sys.path.insert(0, repositoryRoot)
@@ -0,0 +1,21 @@
+# ramafood reads Ramapo College emails, finds the free food events in them and
+# stores the events in MongoDB. Importing the package, or any of the parsing
+# modules, has no side effects: configuration is passed in by the caller (the
+# command line reads it from config.ini), and pymongo, imaplib, html2text,
+# parsedatetime and numpy are only imported by the code that uses them.
+#
+#   stats           instrumentation
+#   guard           size caps, CPU budgets and quarantine of the emails that break them
+#   text, food, dates, paragraphcache
+#                   the pieces the parsers are made of
+#   events          the Event record the parsers return
+#   foodmodel       the trainable food classifier (python -m ramafood.foodmodel)
+#   parsers         email routing and the parser of every email type
+#   pipeline        parsing streams of emails, in a process pool, and offline replay
+#   dedup           near-duplicate event index
+#   storage         MongoDB
+#   feed            the compressed feed of upcoming events the app reads
+#   imap            Gmail over IMAP and the UID checkpoints
+#   sources         reading several mailboxes at once through a pool of IMAP sessions
+#   daemon          the IMAP IDLE daemon
+#   cli             python -m ramafood
@@ -0,0 +1,5 @@
+import sys
+
+from ramafood.cli import main
+
+sys.exit(main())
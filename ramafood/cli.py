@@ -0,0 +1,162 @@
+# The command line: python -m ramafood
+import argparse
+import configparser
+import os
+
+from ramafood import stats, paragraphcache, food, guard
+
+defaultConfigPath = '/home/raa_tey/Documents/pythonEmail/config.ini'
+
+
+def parseArguments(argv=None):
+    argumentParser = argparse.ArgumentParser(prog='python -m ramafood', description='Reads food events from Ramapo emails and stores them in MongoDB')
+    argumentParser.add_argument('--config', default=defaultConfigPath, metavar='PATH',
+        help='config.ini with the [gmailOperations], [database] and [cache] sections (default %(default)s)')
+    argumentParser.add_argument('--replay', nargs='+', metavar='PATH',
+        help='parse .eml files, mbox files or Maildirs instead of reading Gmail, and print the events instead of storing them')
+    argumentParser.add_argument('--daemon', action='store_true',
+        help='keep running: wait for new emails with IMAP IDLE and store their events as they arrive')
+    argumentParser.add_argument('--workers', type=int, default=None, help='number of parser processes')
+    argumentParser.add_argument('--paragraph-cache', metavar='PATH', help='SQLite file caching the analysis of repeated digest and CSI paragraphs')
+    argumentParser.add_argument('--food-engine', choices=sorted(food.foodEngines),
+        help='what decides that a paragraph is about free food: the regex rules (default), the trained model, either or both')
+    argumentParser.add_argument('--food-model', metavar='PATH', help='the model file written by python -m ramafood.foodmodel train')
+    argumentParser.add_argument('--guard', action='store_true',
+        help='cap the text given to the parsers and quarantine emails over their CPU budget or that break a parser, instead of stopping')
+    argumentParser.add_argument('--cpu-budget', type=float, default=5.0, metavar='SECONDS', help='with --guard, CPU seconds one email may take (default %(default)s)')
+    argumentParser.add_argument('--quarantine-dir', default='quarantine', metavar='DIR', help='with --guard, where quarantined emails are saved (default %(default)s)')
+    argumentParser.add_argument('--stats', metavar='PATH',
+        help='record per-stage statistics and write them to PATH at the end of the run (Prometheus text if PATH ends in .prom, JSON otherwise)')
+    argumentParser.add_argument('--profile-slowest', type=int, default=0, metavar='N', help='with --stats, profile every email and keep the N slowest')
+    argumentParser.add_argument('--profile-dir', default='profiles', metavar='DIR', help='where --profile-slowest writes its .prof files')
+    return argumentParser.parse_args(argv)
+
+
+def useFoodEngine(name, modelPath):
+    try:
+        food.useFoodEngine(name, modelPath)
+    except (ValueError, OSError) as error:
+        raise SystemExit('Could not use the %s food engine: %s' % (name, error))
+
+
+def loadConfig(path):
+    config = configparser.ConfigParser()
+    if not config.read(path):
+        raise SystemExit('Could not read the config file %s' % path)
+    return config
+
+
+# Parses saved emails and prints their events
+def replay(paths, workers):
+    from ramafood.pipeline import replayMessageFiles
+    from ramafood.dedup import deduplicateEvents, newEventIndex
+
+    printed = set()
+    for oneEvent in deduplicateEvents(replayMessageFiles(paths, workers), newEventIndex()):
+        if id(oneEvent) in printed:
+            print('    duplicate, sources now %s' % ', '.join(oneEvent.sources))
+            continue
+        printed.add(id(oneEvent))
+        print('%s | %s | %s' % (oneEvent.displayDate(), oneEvent.title.strip(), oneEvent.eventDetails.strip()[:80]))
+    print('%d events' % len(printed))
+
+
+# The mailboxes to read: every label in mailboxes (comma separated, dataOther by
+# default) of the [gmailOperations] account, and one mailbox per [source NAME]
+# section. A source section can name its own emailAddress and pw (club accounts)
+# or use the main account's, and gives its mailbox. rateLimit (messages a second,
+# 0 for none) can be set for the main account and for every source. The throughput
+# report and the parsed messages tell sources apart by name, and checkpoints by
+# account and mailbox, so two sources with the same name or mailbox are an error.
+def configuredSources(config):
+    from ramafood.sources import mailboxSource, sourceCheckpointKey
+
+    account = config['gmailOperations']
+    sources = [mailboxSource(mailbox, account['emailAddress'], account['pw'], mailbox, account.getfloat('rateLimit', fallback=0))
+               for mailbox in (i.strip() for i in account.get('mailboxes', fallback='dataOther').split(',')) if mailbox]
+    for section in config.sections():
+        if section.startswith('source '):
+            source = config[section]
+            sources.append(mailboxSource(section[len('source '):].strip(), source.get('emailAddress', account['emailAddress']),
+                                         source.get('pw', account['pw']), source.get('mailbox', 'dataOther'), source.getfloat('rateLimit', fallback=0)))
+
+    for key, what in ((lambda source: source['name'], 'name'), (sourceCheckpointKey, 'mailbox')):
+        seen = set()
+        for source in sources:
+            if key(source) in seen:
+                raise SystemExit('Two mailboxes to read have the %s %s (check mailboxes and the [source NAME] sections)' % (what, key(source)))
+            seen.add(key(source))
+    return sources
+
+
+# Reads Gmail once, or keeps reading it with daemon, and stores the events in MongoDB.
+# The [food] section of config.ini picks the food engine unless foodEngine was given,
+# and [guard] can turn the guard on.
+def readGmail(config, workers, daemon, foodEngine=None):
+    from ramafood.imap import openCheckpointStore, saveCheckpoint, imapConnect
+    from ramafood.sources import performSourceOperations, throughputReport
+    from ramafood import storage
+
+    emailAddress = config['gmailOperations']['emailAddress']
+    password = config['gmailOperations']['pw']
+    chunkSize = config.getint('gmailOperations', 'fetchChunkSize', fallback=200)
+    maxMessageSize = config.getint('gmailOperations', 'maxMessageSize', fallback=10 * 1024 * 1024)
+    checkpointPath = config.get('gmailOperations', 'checkpointPath', fallback='/home/raa_tey/Documents/pythonEmail/checkpoint.sqlite')
+    parseWorkers = workers or config.getint('gmailOperations', 'parseWorkers', fallback=os.cpu_count())
+    checkpointStore = openCheckpointStore(checkpointPath)
+    if paragraphcache.paragraphCachePath == None and config.has_option('cache', 'paragraphCachePath'):
+        paragraphcache.openParagraphCache(config.get('cache', 'paragraphCachePath'),
+            config.getint('cache', 'paragraphCacheMaxEntries', fallback=100000),
+            config.getint('cache', 'paragraphCacheMaxAgeDays', fallback=60))
+    if not guard.guardEnabled and config.getboolean('guard', 'enabled', fallback=False):
+        guard.useGuard(config.getfloat('guard', 'cpuBudget', fallback=5.0), config.get('guard', 'quarantineDir', fallback='quarantine'))
+    if foodEngine == None and config.has_option('food', 'engine'):
+        useFoodEngine(config.get('food', 'engine'), config.get('food', 'modelPath', fallback=None))
+
+    if daemon:
+        from ramafood.daemon import runDaemonUntilStopped
+        conn = storage.connect_to_db(config['database']['mongo_connection'])
+        storeEvents = storage.eventWriter(storage.foodEventsTable, config.getint('database', 'batchSize', fallback=500),
+                                          storage.foodEventsFeed, config.get('feed', 'feedPath', fallback=None))
+        runDaemonUntilStopped(lambda: imapConnect(emailAddress, password, 'dataOther'), storeEvents, checkpointStore,
+                              emailAddress + '/dataOther', parseWorkers, chunkSize, maxMessageSize,
+                              config.getint('gmailOperations', 'idleTimeout', fallback=29 * 60))
+        conn.close()
+    else:
+        # Events go to MongoDB in batches while later emails are still being read,
+        # from every mailbox at once
+        checkpoints = []
+        throughput = dict()
+        events = performSourceOperations(configuredSources(config), chunkSize, maxMessageSize, checkpointStore, parseWorkers,
+                                         config.getint('gmailOperations', 'maxSessions', fallback=4), checkpoints, throughput)
+        storage.performDatabaseOperations(events, config)
+        for checkpoint in checkpoints:
+            saveCheckpoint(checkpointStore, *checkpoint)
+        print(throughputReport(throughput))
+    checkpointStore.close()
+
+
+def main(argv=None):
+    arguments = parseArguments(argv)
+
+    if arguments.stats:
+        stats.stageStats = stats.newStageStats(arguments.profile_slowest)
+    if arguments.paragraph_cache:
+        paragraphcache.openParagraphCache(arguments.paragraph_cache)
+    if arguments.food_engine:
+        useFoodEngine(arguments.food_engine, arguments.food_model)
+    if arguments.guard:
+        guard.useGuard(arguments.cpu_budget, arguments.quarantine_dir)
+
+    if arguments.replay:
+        replay(arguments.replay, arguments.workers or 1)
+    else:
+        readGmail(loadConfig(arguments.config), arguments.workers, arguments.daemon, arguments.food_engine)
+
+    if paragraphcache.paragraphCachePath != None:
+        print('Paragraph cache: %d entries, %d hits so far' % paragraphcache.paragraphCacheTotals())
+    if arguments.stats:
+        stats.writeStageStats(stats.stageStats, arguments.stats)
+        if arguments.profile_slowest > 0:
+            stats.writeSlowestProfiles(stats.stageStats, arguments.profile_dir)
+    return 0
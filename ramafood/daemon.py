@@ -0,0 +1,214 @@
+# Daemon mode. Instead of one pass per cron run, one IMAP session stays open and
+# waits in IDLE, so a new email is parsed and stored within seconds of arriving.
+# The asyncio loop only coordinates: imaplib is blocking and not thread-safe, so
+# every IMAP call runs on one dedicated thread; parsing runs in a process pool and
+# storing on the loop's default thread pool. Checkpoints work as in batch mode,
+# so nothing is missed across reconnects or restarts.
+import asyncio
+import imaplib
+import select
+import signal
+import ssl
+import time
+from concurrent.futures import ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+from ramafood import stats
+from ramafood.stats import mergeStageStats
+from ramafood.parsers import parseRawMessage, parseRawMessageWithStats, routeEmail
+from ramafood.pipeline import newParserPool
+from ramafood.imap import fetchMessages, messagesToRead, checkUidValidity, loadCheckpoint, saveCheckpoint
+
+
+# Waits up to timeout seconds in IDLE and returns whether new mail arrived.
+# EXISTS responses that came in with earlier commands (imaplib keeps them in
+# untagged_responses) count as new mail without going into IDLE at all.
+# imaplib has IDLE from Python 3.14 on (the IMAP stand-in of the benchmarks has it
+# too); for older versions the command is sent by hand.
+def waitForNewMail(M, timeout):
+    typ, data = M.response('EXISTS')
+    if data[0] != None:
+        return True
+
+    if hasattr(M, 'idle'):
+        with M.idle(duration=timeout) as idler:
+            for typ, data in idler:
+                if typ == 'EXISTS':
+                    return True
+        return False
+    return idleByHand(M, timeout)
+
+
+# Whether a response can be read from M within timeout seconds. imaplib reads
+# through a buffered file, and a response that arrived in the same packet as the
+# one before it is already in that buffer (or in the TLS layer's), where select()
+# on the socket can't see it. So the buffers are looked at first: peek() with the
+# socket non-blocking returns what is buffered without waiting.
+def responseWaiting(M, timeout):
+    if hasattr(M.sock, 'pending') and M.sock.pending():
+        return True
+
+    previousTimeout = M.sock.gettimeout()
+    M.sock.setblocking(False)
+    try:
+        buffered = M.file.peek(1)
+    except (BlockingIOError, ssl.SSLWantReadError):
+        buffered = b''
+    finally:
+        M.sock.settimeout(previousTimeout)
+    return bool(buffered) or bool(select.select([M.sock], [], [], timeout)[0])
+
+
+# IDLE for imaplib without it: sends IDLE, waits for an EXISTS, then ends IDLE with DONE
+def idleByHand(M, timeout):
+    tag = M._new_tag()
+    M.send(tag + b' IDLE\r\n')
+    response = M.readline()
+    if not response.startswith(b'+'):
+        raise M.error('IDLE refused: %r' % response)
+
+    newMail = False
+    deadline = time.monotonic() + timeout
+    while not newMail:
+        remaining = deadline - time.monotonic()
+        if remaining <= 0 or not responseWaiting(M, remaining):
+            break
+        response = M.readline()
+        if not response:
+            raise M.abort('connection closed during IDLE')
+        newMail = response.rstrip().endswith(b'EXISTS')
+
+    M.send(b'DONE\r\n')
+    while not response.startswith(tag):
+        response = M.readline()
+        if not response:
+            raise M.abort('connection closed during IDLE')
+    M.tagged_commands.pop(tag, None)
+    return newMail
+
+
+# Fetches and routes the messages with the given UIDs, as (UID, route name, raw message)
+def fetchNewMessages(M, uids, maxMessageSize):
+    return [ (num, route[0], rawMessage) for num, route, rawMessage in fetchMessages(M, uids, len(uids), maxMessageSize, routeEmail, True) ]
+
+
+# Parses messages in pool without blocking the loop. Returns the events in message
+# order, each with the UID of its email as messageUid, sharing repeated texts.
+async def parseInExecutor(pool, messages):
+    loop = asyncio.get_running_loop()
+    if stats.stageStats == None:
+        results = await asyncio.gather(*(loop.run_in_executor(pool, parseRawMessage, routeName, rawMessage)
+                                         for num, routeName, rawMessage in messages))
+    else:
+        results = await asyncio.gather(*(loop.run_in_executor(pool, parseRawMessageWithStats, routeName, rawMessage)
+                                         for num, routeName, rawMessage in messages))
+        for events, messageStats, seconds, profileStats in results:
+            mergeStageStats(stats.stageStats, messageStats)
+        results = [events for events, messageStats, seconds, profileStats in results]
+
+    texts = dict()
+    for (num, routeName, rawMessage), events in zip(messages, results):
+        for oneEvent in events:
+            oneEvent.messageUid = num
+            oneEvent.shareTexts(texts)
+    return [oneEvent for events in results for oneEvent in events]
+
+
+# The errors storeEvents raises while MongoDB can't be reached. pymongo is only
+# imported by the storage code, and the daemon runs without it in the benchmarks.
+def storageConnectionErrors():
+    try:
+        from pymongo.errors import ConnectionFailure
+    except ImportError:
+        return ()
+    return (ConnectionFailure,)
+
+
+# Runs until cancelled. connect() returns a logged-in IMAP session with the mailbox
+# selected, and storeEvents(events) stores a list of events. A dropped connection,
+# a login the server refuses for now, a database that can't be reached and a
+# parser process that died are retried after 1, 2, 4 ... up to maxBackoff seconds
+# (the checkpoint is only saved once a batch is stored, so the batch is read
+# again); a broken parser pool is replaced first. IDLE is restarted every
+# idleTimeout seconds, as servers drop IDLE sessions after 30 minutes.
+async def runDaemon(connect, storeEvents, checkpointStore=None, mailboxKey='dataOther', workers=1,
+                    chunkSize=200, maxMessageSize=10 * 1024 * 1024, idleTimeout=29 * 60, maxBackoff=300):
+    loop = asyncio.get_running_loop()
+    imapThread = ThreadPoolExecutor(max_workers=1)
+    parsePool = newParserPool(max(workers, 1))
+    storageErrors = storageConnectionErrors()
+    retriedErrors = (imaplib.IMAP4.error, OSError, EOFError, BrokenProcessPool) + storageErrors
+
+    def imap(function, *args):
+        return loop.run_in_executor(imapThread, function, *args)
+
+    # Without a saved checkpoint, the daemon starts with the UNSEEN messages
+    uidValidity, lastUid = (None, None)
+    if checkpointStore != None:
+        uidValidity, lastUid = loadCheckpoint(checkpointStore, mailboxKey)
+
+    backoff = 1
+    try:
+        while True:
+            M = None
+            try:
+                M = await imap(connect)
+                uidValidity, lastUid = checkUidValidity(M, uidValidity, lastUid)
+
+                while True:
+                    highestUid, uids = await imap(messagesToRead, M, lastUid, True)
+                    for chunkStart in range(0, len(uids), chunkSize):
+                        chunk = uids[chunkStart:chunkStart + chunkSize]
+                        messages = await imap(fetchNewMessages, M, chunk, maxMessageSize)
+                        events = await parseInExecutor(parsePool, messages)
+                        if events:
+                            await loop.run_in_executor(None, storeEvents, events)
+                        lastUid = max(chunk)
+                        if checkpointStore != None:
+                            saveCheckpoint(checkpointStore, mailboxKey, uidValidity, lastUid)
+                    if lastUid != highestUid:
+                        lastUid = highestUid
+                        if checkpointStore != None:
+                            saveCheckpoint(checkpointStore, mailboxKey, uidValidity, lastUid)
+                    # Everything there was is stored, so whatever failed works again
+                    backoff = 1
+
+                    if not uids:
+                        await imap(waitForNewMail, M, idleTimeout)
+            except retriedErrors as error:
+                if isinstance(error, BrokenProcessPool):
+                    print('A parser process died (%s), restarting the parser processes in %d s' % (error, backoff))
+                    parsePool.shutdown(wait=False, cancel_futures=True)
+                    parsePool = newParserPool(max(workers, 1))
+                elif isinstance(error, storageErrors):
+                    print('Could not store the events (%s), retrying in %d s' % (error, backoff))
+                else:
+                    print('IMAP connection lost (%s), reconnecting in %d s' % (error, backoff))
+                await asyncio.sleep(backoff)
+                backoff = min(2 * backoff, maxBackoff)
+            finally:
+                # Closing the socket from here also wakes an IDLE that is still waiting
+                if M != None:
+                    try:
+                        M.shutdown()
+                    except Exception:
+                        pass
+    finally:
+        imapThread.shutdown(wait=False, cancel_futures=True)
+        parsePool.shutdown(wait=False, cancel_futures=True)
+
+
+# runDaemon until SIGTERM or Ctrl-C
+def runDaemonUntilStopped(*args, **kwargs):
+    async def main():
+        daemon = asyncio.create_task(runDaemon(*args, **kwargs))
+        asyncio.get_running_loop().add_signal_handler(signal.SIGTERM, daemon.cancel)
+        try:
+            await daemon
+        except asyncio.CancelledError:
+            pass
+
+    try:
+        asyncio.run(main())
+    except KeyboardInterrupt:
+        pass
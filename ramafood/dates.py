@@ -0,0 +1,132 @@
+# Finding the date of an event in its text
+import re
+from datetime import datetime, date
+from functools import lru_cache
+
+from ramafood import stats
+from ramafood.stats import instrumented, sizeOfFirstArgument
+
+
+# this function utilizes parsedatetime module's ability to recognize date related info
+# from strings to parse event dates. Parsedatetime gave me too many false leads
+# when I tried to parse date related info from an unprocessed text. So, I processed
+# string for date related information myself and provided parsedatetime with a string that
+# always has date realted info. parsedatetime parsed the final date and converted
+# into appropriate function for processing
+#
+# The Calendar is built once, on the first date (building it is slower than parsing
+# a date, and importing parsedatetime is most of the import time of the parsers).
+@lru_cache(maxsize=None)
+def dateCalendar():
+    import parsedatetime
+    dateConstants = parsedatetime.Constants()
+    dateConstants.BirthdayEpoch = 80
+    return parsedatetime.Calendar(dateConstants)
+
+
+def convertToPythonDatetimeObj(aDate):
+    time_struct, parse_status = dateCalendar().parse(aDate)
+    return datetime(*time_struct[:6])
+
+
+# The same few date strings ("Oct 5", "tonight") come up again and again in a digest,
+# so parsed dates are memoized. The day is part of the key because "tonight" or
+# "Oct 5" mean a different date tomorrow. A date without a time of day gets the
+# time of the first parse that day, which the uncached parse would have filled in
+# with the current time anyway.
+@lru_cache(maxsize=512)
+def convertToPythonDatetimeObjCached(normalizedDate, day):
+    return convertToPythonDatetimeObj(normalizedDate)
+
+
+# Parsing date from different format of emails was tricky especially because
+# date parsing libraries like parsedatetime did not work as I expected them to work
+# Since identifying eventDates is so critical, it was important for me to get
+# it right in a way that's not too computationally expensive. The date parsing
+# process goes through three iterations. The process continues to the next
+# iteration if the previous iteration does not identify any dates.
+# Iteration 1 : tries to find date in "November 25, 2018", "OCt 5", etc. format.
+#               A month (or a month abbreviation) that is a word of its own,
+#               followed by a word with a number in it. Don't want to extract sth
+#               like 'March madness'. The abbreviations are the ones the first
+#               version knew, which took "Jun" but not "Jun.".
+# Iteration 2: tries to find date in "5-14" or 6/20/2018 (Based on US date form)
+#               3/27    \d{1,2}[\/]{1} {0,1}\d{1,2}
+#               5/2/2015    \d{1,2}[\/-]{1} {0,1}\d{1,2} {0,1}[\/-]{1}\d{2,4}
+#               2015-9-5    \d{4}[\/-]{1} {0,1}\d{1,2}[\/-]{1} {0,1}\d{0,1}
+# Iteration 3: Finally, this iteration tries to find date in natural language
+# format like "tonight", "tomorrow", "right now". "now" on its own is the last
+# ditch effort, because now may not necessarily denote event's date.
+#
+# All of these are found in one scan of the text. Every pattern is a lookahead,
+# so a match doesn't hide another one that starts inside it, and the alternatives
+# are listed in priority order. The group that matched is the kind of date found.
+dateKinds = ('monthName', 'slashDate', 'numericDate', 'isoDate', 'relativeDate', 'now')
+
+datePattern = re.compile(r"""(?=[JFMASOND\drRtTnN])(?:
+    (?=(?P<monthName>(?<!\S)
+        (?P<month>(?:January|February|March|April|May|June|July|August|September|October|November|December)
+                 |(?:Jan|Feb|Mar|Apr|Aug|Sept|Sep|Oct|Nov|Dec)\.?|Jun)
+        (?!\S)\s+[^\s\d]*(?P<day>\d+)))
+    |(?=(?P<slashDate>\d{1,2}[\/]{1}\ {0,1}\d{1,2}))
+    |(?=(?P<numericDate>\d{1,2}[\/-]{1}\ {0,1}\d{1,2}\ {0,1}[\/-]{1}\d{2,4}))
+    |(?=(?P<isoDate>\d{4}[\/-]{1}\ {0,1}\d{1,2}[\/-]{1}\ {0,1}\d{0,1}))
+    |(?=(?P<relativeDate>(?i:right\ now|tonight|today|tomorrow)))
+    |(?=(?P<now>(?i:now)))
+)""", re.VERBOSE)
+
+
+dateIterationNames = {
+    'monthName': 'iteration 1: monthName',
+    'slashDate': 'iteration 2: slashDate',
+    'numericDate': 'iteration 2: numericDate',
+    'isoDate': 'iteration 2: isoDate',
+    'relativeDate': 'iteration 3: relativeDate',
+    'now': 'iteration 3: now',
+    None: 'no date'
+}
+
+
+# Returns (kind of date, date string) for the best date in body, or (None, '') when
+# there is none. A month date wins as soon as it is seen. Otherwise the first date
+# of every kind is kept and the one with the highest priority is returned.
+def findDateString(body):
+    firstOfKind = dict()
+    for matched in datePattern.finditer(body):
+        kind = matched.lastgroup
+        if kind in ('month', 'day', 'monthName'):
+            return 'monthName', matched.group('month').replace(".", "") + ' ' + matched.group('day')
+        if kind not in firstOfKind:
+            firstOfKind[kind] = matched.group(kind)
+
+    for kind in dateKinds[1:]:
+        if kind in firstOfKind:
+            return kind, firstOfKind[kind]
+    return None, ''
+
+
+# findDateString, counted by the instrumentation
+@instrumented('findEventDate', sizeOfFirstArgument)
+def findEventDateString(body):
+    kind, dateString = findDateString(body)
+    if stats.stageStats != None:
+        stats.stageStats['dateIterations'][dateIterationNames[kind]] += 1
+    return kind, dateString
+
+
+# Turns a date string found by findDateString into a datetime, or '' when there
+# was no date. This is kept apart from the search because "tonight" has to be
+# resolved again every day, even when the search result is cached.
+def resolveEventDate(kind, dateString):
+    if kind == None:
+        return ''
+
+    if kind == 'now' or dateString.lower() == 'right now':
+        return convertToPythonDatetimeObj(dateString)   # The current time. Don't cache it
+    return convertToPythonDatetimeObjCached(dateString.lower(), date.today())
+
+
+# Returns the event date found in body as a datetime, or '' when there is none.
+# See findDateString for how the date is picked.
+def findEventDate(body):
+    return resolveEventDate(*findEventDateString(body))
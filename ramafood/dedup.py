@@ -0,0 +1,106 @@
+# Near-duplicate event index
+import hashlib
+import random
+import re
+from collections import defaultdict
+
+from ramafood import stats
+from ramafood.stats import instrumented
+from ramafood.events import Event, upcomingEventsQuery
+
+
+# Near-duplicate events. The same event often arrives through the Daily Digest,
+# the CSI Weekend Edition and the club's own email, each worded a little
+# differently. eventDetails is reduced to a MinHash signature of its word 3-grams,
+# and the signature is cut into bands. Two events with similar details very likely
+# share at least one band, so the index maps (event day, band number, band) to
+# the events in it and a new event is only compared with the events it shares a
+# band with, never with the whole semester. A candidate counts as a duplicate when
+# the signatures agree in at least duplicateThreshold of their positions (that
+# estimates the Jaccard similarity of the 3-grams).
+# With 20 bands of 3 rows, events with similarity 0.5 share a band 93% of the time
+# and events with similarity 0.1 only 2% of the time.
+minHashBands = 20
+minHashRows = 3
+duplicateThreshold = 0.5
+minHashRandom = random.Random(364)     # Fixed seed: signatures must not change between runs
+minHashMasks = tuple(minHashRandom.getrandbits(64) for i in range(minHashBands * minHashRows))
+shingleWordPattern = re.compile(r'\w+')
+
+# Every 3-gram is hashed once with blake2b, and each of the hash functions of the
+# signature is that hash XORed with a random mask
+def eventSignature(eventDetails):
+    words = shingleWordPattern.findall(eventDetails.casefold())
+    shingles = set(' '.join(words[i:i + 3]) for i in range(max(len(words) - 2, 1)))
+    hashes = [int.from_bytes(hashlib.blake2b(i.encode('utf-8'), digest_size=8).digest(), 'big') for i in shingles]
+    return tuple(min(map(mask.__xor__, hashes)) for mask in minHashMasks)
+
+
+# The day an event happens on in Ramapo. Dates the CSI parser found as text went
+# through the same date search as every other email when the event was made (see
+# events.normalizeEventDate), so they land next to the digest's copy of the event.
+def eventDay(eventDate):
+    if eventDate == None:
+        return None
+    return eventDate.date()
+
+
+def newEventIndex():
+    return {'bands': defaultdict(list), 'events': 0}
+
+
+# Returns the event in index that event duplicates, or None. Without a duplicate,
+# event is added to index.
+def findDuplicateEvent(index, event):
+    day = eventDay(event.eventDate)
+    if day == None:
+        return None     # No day to compare on, keep it
+
+    signature = eventSignature(event.eventDetails)
+    bandKeys = [(day, i, signature[i * minHashRows:(i + 1) * minHashRows]) for i in range(minHashBands)]
+
+    seen = set()
+    for key in bandKeys:
+        for candidateSignature, candidate in index['bands'].get(key, ()):
+            if id(candidate) in seen:
+                continue
+            seen.add(id(candidate))
+            agreement = sum(1 for x, y in zip(signature, candidateSignature) if x == y)
+            if agreement >= duplicateThreshold * len(signature):
+                return candidate
+
+    for key in bandKeys:
+        index['bands'][key].append( (signature, event) )
+    index['events'] += 1
+    return None
+
+
+# Adds the events already in the database that haven't happened yet, so that
+# tomorrow's club email is merged into the digest entry stored today. Events
+# without a date (or stored with their date as text) are all added.
+def indexStoredEvents(index, collection):
+    for storedEvent in collection.find(upcomingEventsQuery()):
+        findDuplicateEvent(index, Event.fromDocument(storedEvent))
+
+
+# Returns event, or the event it duplicates with the sources of both
+@instrumented('dedup')
+def deduplicateEvent(index, event):
+    canonical = findDuplicateEvent(index, event)
+    if canonical == None:
+        return event
+
+    for source in event.sources:
+        if stats.stageStats != None:
+            stats.stageStats['duplicates'][source] += 1
+        if source not in canonical.sources:
+            canonical.sources.append(source)
+    return canonical
+
+
+# Yields the first copy of every event. A later near-duplicate is not yielded
+# itself: its sources are merged into the first copy, which is yielded again so
+# that the database gets the new sources.
+def deduplicateEvents(events, index):
+    for oneEvent in events:
+        yield deduplicateEvent(index, oneEvent)
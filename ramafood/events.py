@@ -0,0 +1,108 @@
+# The food event record every parser returns and every later stage (duplicates,
+# MongoDB, the feed) works on
+from datetime import datetime, date, time
+from functools import lru_cache
+
+from ramafood.dates import findDateString, resolveEventDate
+
+
+# Ramapo is in Mahwah, New Jersey. Dates found in emails are wall-clock times there.
+eventTimezoneName = 'America/New_York'
+
+
+# pytz is imported on the first date, like parsedatetime (see dates.dateCalendar)
+@lru_cache(maxsize=None)
+def eventTimezone():
+    import pytz
+    return pytz.timezone(eventTimezoneName)
+
+
+# Returns eventDate as a datetime in eventTimezone, or None when there is none.
+# A naive datetime is a wall-clock time in Ramapo (what parsedatetime returns), an
+# aware one (read back from MongoDB) is converted, and a string (a CSI date such as
+# "the October 5", or an event stored before dates were resolved) goes through the
+# same date search as the body of any other email.
+def normalizeEventDate(eventDate):
+    if isinstance(eventDate, str):
+        eventDate = resolveEventDate(*findDateString(eventDate))
+    if not isinstance(eventDate, datetime):
+        return None
+    if eventDate.tzinfo == None:
+        return eventTimezone().localize(eventDate)
+    if getattr(eventDate.tzinfo, 'zone', None) == eventTimezoneName:
+        return eventDate
+    return eventDate.astimezone(eventTimezone())
+
+
+# Midnight today in Ramapo
+def startOfToday():
+    return eventTimezone().localize(datetime.combine(date.today(), time()))
+
+
+# The MongoDB query for the events from today on, and the ones without a date
+# (eventDate None, or text for events stored before dates were resolved)
+def upcomingEventsQuery():
+    return {'$or': [{'eventDate': {'$gte': startOfToday()}}, {'eventDate': None}, {'eventDate': {'$type': 'string'}}]}
+
+
+# One food event. A semester of them is held by the duplicate index, so an event
+# has slots instead of a dict. The Daily Digest repeats the same entry for days:
+# the events of one run share one copy of every title and details string (see
+# shareTexts and pipeline.parseMessages).
+#   eventDate   a datetime in eventTimezone, or None when no date was found
+#   dateText    the date as the email wrote it, when the parser didn't resolve it
+#               (the CSI Weekend Edition's), '' otherwise
+#   source      the type (route name) of the email the event was found in
+#   messageUid  that email's UID, or message number (set by pipeline.parseMessages)
+#   sources     the types of every email the event was found in (see dedup.py)
+#   fingerprint its identity in MongoDB (see storage.eventFingerprint), once known
+class Event:
+    __slots__ = ('title', 'eventDate', 'dateText', 'eventDetails', 'source', 'messageUid', 'sources', 'fingerprint')
+
+    def __init__(self, title, eventDate, eventDetails, dateText='', source=None, messageUid=None, sources=None, fingerprint=None):
+        self.title = title
+        self.eventDate = normalizeEventDate(eventDate)
+        self.dateText = dateText
+        self.eventDetails = eventDetails
+        self.source = source
+        self.messageUid = messageUid
+        self.sources = sources if sources != None else ([source] if source != None else [])
+        self.fingerprint = fingerprint
+
+    # Events come back from the parser processes through pickle, as a plain tuple of
+    # the fields, which is smaller than the slots state
+    def __reduce__(self):
+        return (Event, (self.title, self.eventDate, self.eventDetails, self.dateText, self.source, self.messageUid,
+                        self.sources, self.fingerprint))
+
+    def __repr__(self):
+        return 'Event(%r, %r, %r)' % (self.title, self.displayDate(), self.eventDetails[:40])
+
+    # The date for people: the datetime, or the text when it couldn't be resolved
+    def displayDate(self):
+        if self.eventDate != None:
+            return self.eventDate.strftime('%Y-%m-%d %H:%M')
+        return self.dateText
+
+    # Replaces the title and details by the equal strings in texts (a dict of
+    # strings to themselves), and adds them when there are none. texts is owned by
+    # whoever holds the events, so the strings go away with it; sys.intern would
+    # keep them for good on some Python versions.
+    def shareTexts(self, texts):
+        self.title = texts.setdefault(self.title, self.title)
+        self.eventDetails = texts.setdefault(self.eventDetails, self.eventDetails)
+
+    def setSource(self, source):
+        self.source = source
+        self.sources = [source]
+
+    # The fields of the MongoDB document. pymongo stores eventDate in UTC.
+    def document(self):
+        return {'fingerprint': self.fingerprint, 'title': self.title, 'eventDate': self.eventDate, 'dateText': self.dateText,
+                'eventDetails': self.eventDetails}
+
+    @classmethod
+    def fromDocument(cls, document):
+        return cls(document['title'], document.get('eventDate'), document['eventDetails'],
+                   document.get('dateText') or (document['eventDate'] if isinstance(document.get('eventDate'), str) else ''),
+                   document.get('source'), document.get('messageUid'), list(document.get('sources', [])), document.get('fingerprint'))
@@ -0,0 +1,99 @@
+# The event feed the Android app reads: the upcoming events as one gzip-compressed
+# JSON document, rebuilt after every ingest, so a refresh is one small read instead
+# of a query over foodEventsTable. Past events leave the collection through a TTL
+# index on expiresAt.
+import gzip
+import hashlib
+import json
+import os
+from datetime import datetime, timedelta, timezone
+
+from ramafood.stats import instrumented
+from ramafood.events import Event, upcomingEventsQuery
+
+
+# An event with a date expires eventExpiryGrace after it starts. Events whose date
+# is still text (the CSI Weekend Edition's "5th October") expire
+# undatedEventLifetime after they were last written, so they go away once the
+# emails stop announcing them.
+eventExpiryGrace = timedelta(days=1)
+undatedEventLifetime = timedelta(days=14)
+
+# The feed is the document with this _id in the feed collection
+feedDocumentId = 'upcoming'
+
+
+# When MongoDB's TTL monitor may delete an event with eventDate (None or text
+# when it has no date)
+def eventExpiry(eventDate, now=None):
+    if isinstance(eventDate, datetime):
+        return eventDate + eventExpiryGrace
+    return (now or datetime.now(timezone.utc)) + undatedEventLifetime
+
+
+# The index the feed query sorts on and the TTL index. create_index does nothing
+# when the index already exists. Events stored before expiresAt existed get one.
+def ensureEventIndexes(collection):
+    collection.create_index('eventDate')
+    collection.create_index('expiresAt', expireAfterSeconds=0)
+    for storedEvent in collection.find({'expiresAt': {'$exists': False}}, {'eventDate': 1}):
+        collection.update_one({'_id': storedEvent['_id']}, {'$set': {'expiresAt': eventExpiry(storedEvent.get('eventDate'))}})
+
+
+# Events from today on, and the ones without a date, oldest first. Dated events
+# come before the others, which can't be ordered by date.
+def upcomingEvents(collection):
+    projection = {'_id': 0, 'fingerprint': 1, 'title': 1, 'eventDate': 1, 'dateText': 1, 'eventDetails': 1, 'sources': 1}
+    events = [Event.fromDocument(i) for i in collection.find(upcomingEventsQuery(), projection)]
+    return (sorted((i for i in events if i.eventDate != None), key=lambda i: i.eventDate) +
+            sorted((i for i in events if i.eventDate == None), key=lambda i: i.title))
+
+
+# An event of the feed. The date is ISO 8601 with Ramapo's UTC offset, or the text
+# of a date that couldn't be resolved.
+def feedEntry(event):
+    eventDate = event.eventDate.isoformat(timespec='minutes') if event.eventDate != None else event.dateText
+    return {'id': event.fingerprint, 'title': event.title.strip(), 'date': eventDate,
+            'details': event.eventDetails.strip(), 'sources': event.sources}
+
+
+# The JSON of the feed's events, as compact as json makes it, and its ETag (a hash
+# of that JSON, so it only changes when the events do)
+def feedEventsJson(events):
+    eventsJson = json.dumps([feedEntry(i) for i in events], separators=(',', ':'), ensure_ascii=False).encode('utf-8')
+    return eventsJson, hashlib.sha1(eventsJson).hexdigest()
+
+
+# The gzip-compressed body the app downloads: {"version": ..., "etag": ..., "events": [...]}.
+# mtime=0 keeps the bytes the same for the same events.
+def feedBody(eventsJson, version, etag):
+    return gzip.compress(b'{"version":%d,"etag":"%s","events":%s}' % (version, etag.encode('ascii'), eventsJson), mtime=0)
+
+
+# Rebuilds the feed document from collection and stores it in feedCollection, and
+# in feedPath when there is one (written to a temporary file and renamed, so a web
+# server never serves half a file). The version goes up only when the events
+# changed. Returns the feed document without its body.
+@instrumented('feed')
+def publishFeed(collection, feedCollection, feedPath=None):
+    events = upcomingEvents(collection)
+    eventsJson, etag = feedEventsJson(events)
+    previous = feedCollection.find_one({'_id': feedDocumentId}, {'body': 0})
+    if previous != None and previous['etag'] == etag:
+        previous['changed'] = False
+        return previous
+
+    version = previous['version'] + 1 if previous != None else 1
+    body = feedBody(eventsJson, version, etag)
+    document = {'_id': feedDocumentId, 'version': version, 'etag': etag, 'generatedAt': datetime.now(timezone.utc),
+                'events': len(events), 'encoding': 'gzip', 'body': body}
+    feedCollection.replace_one({'_id': feedDocumentId}, document, upsert=True)
+
+    if feedPath != None:
+        with open(feedPath + '.tmp', 'wb') as feedFile:
+            feedFile.write(body)
+        os.replace(feedPath + '.tmp', feedPath)
+
+    del document['body']
+    document['changed'] = True
+    return document
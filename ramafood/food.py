@@ -0,0 +1,179 @@
+# The food classifier
+import re
+
+from ramafood import stats
+from ramafood.stats import instrumented, sizeOfFirstArgument
+from ramafood.guard import checkBudget
+
+
+# Gift card prices (e.g. "$10 gift card") don't make an event paid, so the
+# dollar sign check looks for them around the "$"
+giftCardPattern = re.compile(r"gift([ -]){0,1}card", re.IGNORECASE)
+
+# Food rules. Each rule is (rule name, regex, literal). The literal is a piece of
+# text every match of the regex must contain (lower case). It is checked with a
+# plain substring search first, so the regex only runs on paragraphs that could
+# match it. The rule name is what matchFoodRule reports when the rule fires.
+
+# Keyword rules. The rule name is the regex itself.
+# Note: "\bchilli\b", "\bdumpling\b" and "\bmomo\b" are not raw strings, so \b is
+# a backspace character there. They are kept exactly as they were so that the
+# compiled matcher gives the same answers as the old pattern loop.
+foodKeywordRules = tuple( (aPattern, aPattern, literal) for aPattern, literal in (
+    (r"Food will be", 'food will be'), (r'\brefreshment', 'refreshment'), (r'and food', 'and food'),
+    (r"food and", 'food and'), (r'\bdrinks\b', 'drinks'), (r'ice[- \.]cream', 'cream'),
+    (r'\bpizza\b', 'pizza'), (r'\bsandwich\b', 'sandwich'), (r"\bmoe's\b", "moe's"),
+    (r"\bchipotle\b", 'chipotle'), (r"\bmozzarella\b", 'mozzarella'), (r"\btaco\b", 'taco'),
+    (r"for food", 'for food'), (r"\bbagel\b", 'bagel'), (r"\bpasta\b", 'pasta'),
+    (r"\bnuggets\b", 'nuggets'), ("\bchilli\b", 'chilli'), ("\bdumpling\b", 'dumpling'),
+    ("\bmomo\b", 'momo'), (r"\bfajita\b", 'fajita'), (r"\bchicken\b", 'chicken'),
+    (r"\bpork\b", 'pork'), (r"\broast\b", 'roast'), (r"\bcheese\b", 'cheese'),
+    (r"enchilada", 'enchilada'), (r"\bwings\b", 'wings'), (r"\bpie\b", 'pie'),
+    (r"\bnachos\b", 'nachos'), (r"\bcookies\b", 'cookies'), (r"burger", 'burger'),
+    (r"\bturkey\b", 'turkey'), (r"will be served", 'will be served'), (r'cake\b', 'cake'),
+    (r'snack', 'snack'), (r'\bdessert\b', 'dessert'), (r'\bdinner\b', 'dinner'),
+    (r"nicky's", "nicky's"), (r"bbq", 'bbq'), (r'\bnoodles\b', 'noodles'),
+    (r'\bhalal\b', 'halal'), (r'\bkosher\b', 'kosher'), (r'fries', 'fries'), (r'cuisine', 'cuisine'),
+    (r'jun lung', 'jun lung'), (r'carnival\b', 'carnival'),
+    # r'(Indian|Chinese|Mexican|Korean|Italian|delicious|tasty|Italian|Latin|Spanish|Asian|Nepali|Brazilian) food',
+    # The computationally expensive regEx above did not improve food detetion rate significantly
+
+    # mo:mo
+    (r"\bmo([:]){0,1}mo(s){0,1}\b", 'mo'), # Mo:mos are my favorite NEpali dish. So, I would be sad if my app doesn't detect events with free mo:mo
+))
+
+# Proximity rules ("free AROUND 2 food"). These backtrack over the words in
+# between, so they run as a second stage only when no keyword matched.
+foodProximityRules = (
+    ('great AROUND 2 food', r"\bgreat\W+(?:\w+\W+){0,2}?food\b", 'food'),
+    ('ve AROUND 2 food', r"ve\W+(?:\w+\W+){0,2}?food\b", 'food'), #have food.  We've got food
+    ('free AROUND 2 food', r"\bfree\W+(?:\w+\W+){0,2}?food\b", 'food'),
+    ('be AROUND 6 food', r"\bbe\W+(?:\w+\W+){0,6}?food\b", 'food'),
+    ('food AROUND 4 from', r"\bfood\W+(?:\w+\W+){0,4}?from\b", 'from'),
+    ('of AROUND 2 food', r"\bof\W+(?:\w+\W+){0,2}?food\b", 'food'),
+    ('enjoy AROUND 5 food', r"\benjoy\W+(?:\w+\W+){0,5}?food\b", 'food'),
+)
+
+# Both stages are compiled once, at import
+foodMatcherStages = tuple(
+    tuple( (ruleName, re.compile(aPattern, re.IGNORECASE), literal) for ruleName, aPattern, literal in rules )
+    for rules in (foodKeywordRules, foodProximityRules)
+)
+
+
+def isThisAFreeEvent(body):
+    dollarIndex = body.find('$')
+    boundary = 30 #Check 30 characters to the right of "$" and 30 characters to the left of "$"
+    if dollarIndex == -1:
+        return True
+
+    remainingChar = len(body) - dollarIndex
+    if remainingChar < boundary:
+        rightOfDollar = body[dollarIndex:]
+    else:
+        rightOfDollar = body[dollarIndex:dollarIndex + boundary]
+
+    if dollarIndex > boundary:
+        leftOfDollar = body[dollarIndex - boundary:dollarIndex]
+    else:
+        leftOfDollar = body[:dollarIndex]
+
+    if giftCardPattern.search(leftOfDollar) or giftCardPattern.search(rightOfDollar):
+        return True
+    return False
+
+
+# Returns the name of the food rule that fired for a paragraph, or None when the
+# paragraph is not about free food. The keyword stage runs first and the proximity
+# stage runs only if no keyword matched.
+def matchFoodRule(par):
+    if not isThisAFreeEvent(par):
+        return None
+
+    # re.IGNORECASE matches 'i' to U+0130 (dotted capital I) and U+0131 (dotless
+    # small i), which casefold() turns into 'i' plus a combining dot and leaves
+    # alone. Every other letter it folds at least as re.IGNORECASE does, so with
+    # those two replaced, a rule whose literal is not in foldedPar can't match par.
+    foldedPar = par.replace('\u0130', 'i').replace('\u0131', 'i').casefold()
+    for rules in foodMatcherStages:
+        for ruleName, compiledRule, literal in rules:
+            if literal in foldedPar and compiledRule.search(par):
+                if stats.stageStats != None:
+                    stats.stageStats['foodRules'][ruleName] += 1
+                return ruleName
+    return None
+
+
+# The function below is the most important function in this script and in the entire
+# project beacause this function detects if an event contains food related information.
+# Unsurprisingly, the function is computationally expensive. The rules are compiled
+# once at import and guarded by cheap substring checks (see foodMatcherStages) to
+# keep the cost down.
+@instrumented('isThisAFoodEvent', sizeOfFirstArgument)
+def isThisAFoodEvent(par):
+    #To Dos: 'will AROUND 7 food'. Create expressions that help you with this.
+    return matchFoodRule(par) != None
+
+
+# Food engines. An engine takes a list of paragraphs and returns a list with True
+# for every paragraph about free food, so that it can score many at once. The
+# parsers use foodEngines[foodEngine], and other engines can be added to the dict.
+# "model" is the trained classifier of foodmodel, loaded by useFoodEngine; "either"
+# and "both" combine it with the regex rules.
+foodEngine = 'regex'
+foodModel = None
+foodModelPath = None
+
+
+# The parsers hand over all the paragraphs of an email at once, so the guard's
+# budget is checked between paragraphs here, where the rules run
+def regexFoodEngine(paragraphs):
+    results = []
+    for i in paragraphs:
+        checkBudget()
+        results.append(isThisAFoodEvent(i))
+    return results
+
+
+def modelFoodEngine(paragraphs):
+    from ramafood.foodmodel import predictFood
+    return predictFood(foodModel, paragraphs)
+
+
+def eitherFoodEngine(paragraphs):
+    return [byRules or byModel for byRules, byModel in zip(regexFoodEngine(paragraphs), modelFoodEngine(paragraphs))]
+
+
+def bothFoodEngine(paragraphs):
+    return [byRules and byModel for byRules, byModel in zip(regexFoodEngine(paragraphs), modelFoodEngine(paragraphs))]
+
+
+foodEngines = {'regex': regexFoodEngine, 'model': modelFoodEngine, 'either': eitherFoodEngine, 'both': bothFoodEngine}
+modelFoodEngines = ('model', 'either', 'both')
+
+
+# Makes the parsers use the engine called name. The engines that need the model
+# load it from modelPath.
+def useFoodEngine(name, modelPath=None):
+    global foodEngine, foodModel, foodModelPath
+    if name not in foodEngines:
+        raise ValueError('Unknown food engine %s (one of %s)' % (name, ', '.join(sorted(foodEngines))))
+    if name in modelFoodEngines:
+        if modelPath == None:
+            raise ValueError('The %s food engine needs a model file' % name)
+        from ramafood.foodmodel import loadFoodModel
+        foodModel = loadFoodModel(modelPath)
+        foodModelPath = modelPath
+    foodEngine = name
+
+
+# What the paragraph cache keys on, so that results of one engine or model are
+# not reused with another
+def foodEngineKey():
+    if foodEngine in modelFoodEngines:
+        return '%s:%s' % (foodEngine, foodModel['digest'])
+    return foodEngine
+
+
+def classifyFoodParagraphs(paragraphs):
+    return foodEngines[foodEngine](list(paragraphs))
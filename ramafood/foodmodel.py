@@ -0,0 +1,219 @@
+# The trainable food classifier: hashed word n-grams and a logistic regression,
+# scored for many paragraphs at once with NumPy
+import argparse
+import hashlib
+import json
+import sys
+
+from ramafood.stats import instrumented
+
+
+# Features. A paragraph is cut into words (runs of letters, digits, apostrophes and
+# non-ASCII characters) and "$", which makes an event paid, and every word and
+# every pair of neighbouring words is hashed into one of 2**hashBits columns. The
+# values of a row are 1/sqrt(number of n-grams), so long paragraphs don't score
+# higher just for being long. The features of a batch are a sparse matrix in
+# coordinate form: (rows, columns, values), one entry per n-gram, and the products
+# the model needs are np.bincount calls over it.
+#
+# The whole batch is hashed at once. Its paragraphs are joined into one byte array
+# and a word's hash is the polynomial sum(byte * hashBase**i) over its bytes mod
+# 2**64, taken from a prefix sum of the array. The column of an n-gram is the top
+# hashBits bits of its hash times columnMultiplier.
+defaultHashBits = 18
+wordBytes = b"abcdefghijklmnopqrstuvwxyz0123456789'" + bytes(range(128, 256))
+hashBase = 0x100000001B3
+bigramMultiplier = 0x100000001B3
+columnMultiplier = 0x9E3779B97F4A7C15
+
+# Saved with every model. Bump it whenever the features change, so that models
+# trained on the old features are refused.
+featureVersion = 1
+
+# The model is used when its probability of food is at least threshold
+defaultThreshold = 0.5
+
+
+# NumPy is imported on the first call, so that the parsers don't need it unless
+# the model engine is in use
+def numpy():
+    import numpy
+    return numpy
+
+
+def wordHashes(paragraphs):
+    np = numpy()
+    encoded = [i.casefold().encode('utf-8') for i in paragraphs]
+    text = np.frombuffer(b'\0'.join(encoded) + b'\0', dtype=np.uint8)
+    isWord = np.zeros(256, dtype=bool)
+    isWord[np.frombuffer(wordBytes, dtype=np.uint8)] = True
+    isWord = isWord[text]
+    isDollar = text == ord('$')
+
+    # Words start after a non-word byte and end before one. "$" is a word of its own.
+    before = np.concatenate( ([False], isWord[:-1]) )
+    after = np.concatenate( (isWord[1:], [False]) )
+    starts = np.flatnonzero( (isWord & ~before) | isDollar )
+    ends = np.flatnonzero( (isWord & ~after) | isDollar ) + 1
+
+    powers = np.full(len(text), hashBase, dtype=np.uint64)
+    powers[0] = 1
+    powers = np.cumprod(powers)
+    # hashBase is odd, so it has an inverse mod 2**64
+    inversePowers = np.full(len(text), pow(hashBase, -1, 1 << 64), dtype=np.uint64)
+    inversePowers[0] = 1
+    inversePowers = np.cumprod(inversePowers)
+    prefix = np.concatenate( (np.zeros(1, dtype=np.uint64), np.cumsum(text.astype(np.uint64) * powers)) )
+
+    hashes = (prefix[ends] - prefix[starts]) * inversePowers[starts]
+    # Rows come from where each paragraph ends, not from the NULs: a paragraph can
+    # have NULs of its own
+    paragraphEnds = np.cumsum(np.fromiter((len(i) + 1 for i in encoded), dtype=np.int64, count=len(encoded))) - 1
+    rows = np.searchsorted(paragraphEnds, starts)
+    return hashes, rows
+
+
+def featureMatrix(paragraphs, hashBits):
+    np = numpy()
+    hashes, wordRows = wordHashes(paragraphs)
+    sameRow = wordRows[1:] == wordRows[:-1]
+    bigramHashes = hashes[:-1] * np.uint64(bigramMultiplier) + hashes[1:] + np.uint64(1)
+
+    rows = np.concatenate( (wordRows, wordRows[1:][sameRow]) )
+    columns = (np.concatenate( (hashes, bigramHashes[sameRow]) ) * np.uint64(columnMultiplier)) >> np.uint64(64 - hashBits)
+    counts = np.bincount(rows, minlength=len(paragraphs))
+    values = 1 / np.sqrt(np.maximum(counts, 1))[rows]
+    return rows, columns.astype(np.int64), values
+
+
+def sigmoid(np, scores):
+    return 1 / (1 + np.exp(-np.clip(scores, -30, 30)))
+
+
+# Probability of food for every paragraph, as a NumPy array
+def foodProbabilities(model, paragraphs):
+    np = numpy()
+    rows, columns, values = featureMatrix(paragraphs, model['hashBits'])
+    scores = np.bincount(rows, weights=model['weights'][columns] * values, minlength=len(paragraphs))
+    return sigmoid(np, scores + model['bias'])
+
+
+def sizeOfParagraphs(args, result):
+    return sum(len(i) for i in args[1])
+
+
+# Returns a list with True for every paragraph the model thinks is about food
+@instrumented('foodModel', sizeOfParagraphs)
+def predictFood(model, paragraphs):
+    if not paragraphs:
+        return []
+    return (foodProbabilities(model, paragraphs) >= model['threshold']).tolist()
+
+
+# Fits a logistic regression to labels (True for food) with full-batch AdaGrad
+# and a small L2 penalty. The classes are weighted so that the rarer one (food)
+# counts as much as the other.
+def trainFoodModel(paragraphs, labels, hashBits=defaultHashBits, epochs=200, learningRate=0.5, l2=1e-6, threshold=defaultThreshold):
+    np = numpy()
+    rows, columns, values = featureMatrix(paragraphs, hashBits)
+    labels = np.array(labels, dtype=np.float64)
+    positives = max(labels.sum(), 1)
+    negatives = max(len(labels) - labels.sum(), 1)
+    sampleWeights = np.where(labels == 1, len(labels) / (2 * positives), len(labels) / (2 * negatives))
+
+    weights = np.zeros(1 << hashBits)
+    bias = 0.0
+    squaredGradients = np.full(1 << hashBits, 1e-8)
+    squaredBiasGradient = 1e-8
+    for epoch in range(epochs):
+        scores = np.bincount(rows, weights=weights[columns] * values, minlength=len(labels)) + bias
+        errors = (sigmoid(np, scores) - labels) * sampleWeights / len(labels)
+        gradient = np.bincount(columns, weights=errors[rows] * values, minlength=1 << hashBits) + l2 * weights
+        squaredGradients += gradient ** 2
+        weights -= learningRate * gradient / np.sqrt(squaredGradients)
+        biasGradient = errors.sum()
+        squaredBiasGradient += biasGradient ** 2
+        bias -= learningRate * biasGradient / squaredBiasGradient ** 0.5
+
+    return {'weights': weights.astype(np.float32), 'bias': bias, 'hashBits': hashBits, 'threshold': threshold}
+
+
+def saveFoodModel(model, path):
+    np = numpy()
+    with open(path, 'wb') as modelFile:
+        np.savez_compressed(modelFile, weights=model['weights'], bias=model['bias'], hashBits=model['hashBits'], threshold=model['threshold'],
+                            featureVersion=featureVersion)
+
+
+# Loads a model saved by saveFoodModel. digest identifies the model file, for the
+# paragraph cache.
+def loadFoodModel(path):
+    np = numpy()
+    with open(path, 'rb') as modelFile:
+        digest = hashlib.sha1(modelFile.read()).hexdigest()[:12]
+    with np.load(path) as saved:
+        if 'featureVersion' not in saved or int(saved['featureVersion']) != featureVersion:
+            raise ValueError('%s was trained on other features, train it again' % path)
+        return {'weights': saved['weights'], 'bias': float(saved['bias']), 'hashBits': int(saved['hashBits']),
+                'threshold': float(saved['threshold']), 'digest': digest}
+
+
+# Writes the paragraphs the food rules see in the emails stored in paths, one JSON
+# object per line: {"paragraph": ..., "food": what the regex rules say}. The labels
+# can be corrected by hand before training.
+def exportLabeledParagraphs(paths, outputPath):
+    from ramafood.pipeline import readMessageFiles
+    from ramafood.parsers import foodCheckedParagraphs
+    from ramafood.food import isThisAFoodEvent
+
+    count = 0
+    with open(outputPath, 'w', encoding='utf-8') as output:
+        for rawMessage in readMessageFiles(paths):
+            for paragraph in foodCheckedParagraphs(rawMessage):
+                output.write(json.dumps({'paragraph': paragraph, 'food': isThisAFoodEvent(paragraph)}) + '\n')
+                count += 1
+    return count
+
+
+def readLabeledParagraphs(path):
+    paragraphs = []
+    labels = []
+    with open(path, encoding='utf-8') as labeled:
+        for line in labeled:
+            if line.strip():
+                example = json.loads(line)
+                paragraphs.append(example['paragraph'])
+                labels.append(bool(example['food']))
+    return paragraphs, labels
+
+
+# python -m ramafood.foodmodel export MAILBOX... --output labeled.jsonl
+# python -m ramafood.foodmodel train labeled.jsonl --output food.npz
+def main(argv=None):
+    argumentParser = argparse.ArgumentParser(prog='python -m ramafood.foodmodel', description='Trains the food classifier used by --food-engine model')
+    commands = argumentParser.add_subparsers(dest='command', required=True)
+    exportCommand = commands.add_parser('export', help='write the paragraphs of saved emails, labeled by the regex rules')
+    exportCommand.add_argument('paths', nargs='+', metavar='PATH', help='.eml files, mbox files or Maildirs')
+    exportCommand.add_argument('--output', required=True, metavar='PATH')
+    trainCommand = commands.add_parser('train', help='train a model on labeled paragraphs')
+    trainCommand.add_argument('labeled', metavar='PATH', help='JSON lines written by export')
+    trainCommand.add_argument('--output', required=True, metavar='PATH', help='the model file (.npz)')
+    trainCommand.add_argument('--hash-bits', type=int, default=defaultHashBits)
+    trainCommand.add_argument('--epochs', type=int, default=200)
+    trainCommand.add_argument('--threshold', type=float, default=defaultThreshold)
+    arguments = argumentParser.parse_args(argv)
+
+    if arguments.command == 'export':
+        print('%d paragraphs written to %s' % (exportLabeledParagraphs(arguments.paths, arguments.output), arguments.output))
+        return 0
+
+    paragraphs, labels = readLabeledParagraphs(arguments.labeled)
+    model = trainFoodModel(paragraphs, labels, arguments.hash_bits, arguments.epochs, threshold=arguments.threshold)
+    saveFoodModel(model, arguments.output)
+    agreement = sum(1 for predicted, label in zip(predictFood(model, paragraphs), labels) if predicted == label)
+    print('Trained on %d paragraphs (%d about food), %.1f%% agree with their labels' % (len(labels), sum(labels), 100 * agreement / max(len(labels), 1)))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
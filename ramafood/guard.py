@@ -0,0 +1,93 @@
+# The guard: what one email may cost the parsers. With it on, the text handed to
+# the regex stages is capped in size and every email gets a CPU time budget, so a
+# malformed email can't stall a whole batch. An email that goes over its budget,
+# or that makes a parser raise, is quarantined: its events are dropped, the email
+# is saved to quarantineDir with the reason in quarantine.log, and the run goes
+# on. Every trip is counted in stats.stageStats['guardTrips'].
+import hashlib
+import os
+import time
+
+from ramafood import stats
+
+
+guardEnabled = False
+
+# A digest or CSI paragraph is cut to maxParagraphLength characters and the body
+# of a free-form email to maxBodyLength. Events are at the start of both, and the
+# cost of the regex stages grows with the length of their text.
+maxParagraphLength = 20000
+maxBodyLength = 100000
+
+# CPU seconds one email may take. Python can't interrupt a regex, so the parsers
+# check the budget between paragraphs and text parts (checkBudget), and the size
+# caps bound what a single paragraph can cost.
+messageCpuBudget = 5.0
+quarantineDir = None
+
+# thread_time() after which the email being parsed is over its budget
+messageDeadline = None
+
+
+class BudgetExceeded(Exception):
+    pass
+
+
+def useGuard(cpuBudget=5.0, quarantinePath=None):
+    global guardEnabled, messageCpuBudget, quarantineDir
+    guardEnabled = True
+    messageCpuBudget = cpuBudget
+    quarantineDir = quarantinePath
+    if quarantineDir != None:
+        os.makedirs(quarantineDir, exist_ok=True)
+
+
+def countTrip(reason):
+    if stats.stageStats != None:
+        stats.stageStats['guardTrips'][reason] += 1
+
+
+# Returns text, cut to limit characters when the guard is on
+def capText(text, limit, reason):
+    if guardEnabled and len(text) > limit:
+        countTrip(reason)
+        return text[:limit]
+    return text
+
+
+def checkBudget():
+    if messageDeadline != None and time.thread_time() > messageDeadline:
+        raise BudgetExceeded('over the %g s CPU budget' % messageCpuBudget)
+
+
+def quarantineMessage(routeName, rawMessage, reason, explanation):
+    countTrip(reason)
+    digest = hashlib.sha1(rawMessage).hexdigest()
+    print('Quarantined %s email %s: %s' % (routeName, digest[:12], explanation))
+    if quarantineDir == None:
+        return
+
+    with open(os.path.join(quarantineDir, digest + '.eml'), 'wb') as quarantined:
+        quarantined.write(rawMessage)
+    # One short line per append, so the parser processes can share the log
+    with open(os.path.join(quarantineDir, 'quarantine.log'), 'a') as log:
+        log.write('%s\t%s\t%s\t%s\n' % (time.strftime('%Y-%m-%dT%H:%M:%S'), digest, routeName, explanation.replace('\n', ' ')))
+
+
+# Returns parse(routeName, rawMessage), or no events when the email went over its
+# budget (checked once more at the end, for emails with nothing between checks) or
+# the parser raised
+def guardedParse(parse, routeName, rawMessage):
+    global messageDeadline
+    messageDeadline = time.thread_time() + messageCpuBudget
+    try:
+        events = parse(routeName, rawMessage)
+        checkBudget()
+        return events
+    except BudgetExceeded as error:
+        quarantineMessage(routeName, rawMessage, 'cpuBudget', str(error))
+    except Exception as error:
+        quarantineMessage(routeName, rawMessage, 'parserError', '%s: %s' % (type(error).__name__, error))
+    finally:
+        messageDeadline = None
+    return []
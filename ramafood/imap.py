@@ -0,0 +1,217 @@
+# Reading emails from Gmail over IMAP, and the UID checkpoints
+import email
+import imaplib
+import re
+import sqlite3
+import time
+
+from ramafood.stats import instrumented
+
+
+# Turns message numbers into an IMAP message set, e.g. [1, 2, 3, 7] -> '1:3,7'
+def toMessageSet(messageNumbers):
+    ranges = []
+    start = previous = None
+    for num in messageNumbers:
+        if previous != None and num == previous + 1:
+            previous = num
+            continue
+        if start != None:
+            ranges.append(str(start) if start == previous else '%d:%d' % (start, previous))
+        start = previous = num
+
+    if start != None:
+        ranges.append(str(start) if start == previous else '%d:%d' % (start, previous))
+    return ','.join(ranges)
+
+
+# imaplib returns a FETCH response for several messages as a flat list. Messages
+# with a literal (like RFC822) come as (b'12 (RFC822 {3456}', b'<message>') tuples,
+# messages without one (like RFC822.SIZE) as plain b'12 (RFC822.SIZE 3456)' lines.
+# Some servers send items after the literal, in the line that closes the message
+# (b' UID 55 RFC822.SIZE 3456)'), so that line is added to the header that is
+# yielded. With useUid the UID from the response is yielded instead of the message
+# number.
+fetchResponsePattern = re.compile(rb'^(\d+) \(')
+fetchSizePattern = re.compile(rb'RFC822\.SIZE (\d+)')
+fetchUidPattern = re.compile(rb'\bUID (\d+)')
+
+def fetchResponseItems(data, useUid=False):
+    for index, item in enumerate(data):
+        if isinstance(item, tuple):
+            header, literal = item
+        else:
+            header, literal = item, None
+
+        matched = fetchResponsePattern.match(header)
+        if matched == None:
+            continue
+
+        if literal != None and index + 1 < len(data) and isinstance(data[index + 1], bytes):
+            header += data[index + 1]
+
+        if not useUid:
+            yield int(matched.group(1)), header, literal
+            continue
+
+        matched = fetchUidPattern.search(header)
+        if matched != None:
+            yield int(matched.group(1)), header, literal
+
+
+def sizeOfImapResponse(args, result):
+    typ, data = result
+    return sum(len(item[1]) for item in data if isinstance(item, tuple))
+
+
+# Runs FETCH, STORE or SEARCH either on message numbers or, with useUid, on UIDs
+@instrumented('imap', sizeOfImapResponse)
+def imapCommand(M, useUid, command, *args):
+    if useUid:
+        return M.uid(command, *args)
+    return getattr(M, command.lower())(*args)
+
+
+headerFetchItems = '(RFC822.SIZE BODY.PEEK[HEADER.FIELDS (FROM SUBJECT DATE)])'
+
+# Fetches messages chunkSize at a time, in two phases per chunk. The first phase
+# fetches only the From, Subject and Date headers and the size of every message
+# (BODY.PEEK doesn't mark them as seen). routeMessage(headers) picks a route for
+# each message or returns None to skip it. Messages bigger than maxMessageSize
+# bytes are skipped too, so that one huge attachment can't blow up memory. Skipped
+# messages are marked as seen. The second phase downloads only the messages that
+# will be parsed. A backlog of n messages takes about 3 * n / chunkSize round trips
+# instead of n. Yields (message number, route, raw message bytes) in mailbox order
+# as each chunk arrives. With useUid, messageNumbers are UIDs and UIDs are yielded.
+# With perSecond, chunks hold at most perSecond messages and each download waits
+# until the ones before it are 1 / perSecond seconds a message apart, counting from
+# the first, so that no more than about perSecond messages a second are downloaded.
+def fetchMessages(M, messageNumbers, chunkSize=200, maxMessageSize=10 * 1024 * 1024, routeMessage=None, useUid=False, perSecond=0):
+    messageNumbers = sorted(int(num) for num in messageNumbers)
+    if perSecond:
+        chunkSize = max(1, min(chunkSize, int(perSecond)))
+    firstDownload = None
+    downloaded = 0
+
+    for chunkStart in range(0, len(messageNumbers), chunkSize):
+        chunk = messageNumbers[chunkStart:chunkStart + chunkSize]
+
+        typ, data = imapCommand(M, useUid, 'FETCH', toMessageSet(chunk), headerFetchItems)
+        routes = dict()
+        skipped = []
+        for num, header, literal in fetchResponseItems(data, useUid):
+            matched = fetchSizePattern.search(header)
+            size = int(matched.group(1)) if matched != None else 0
+            if size > maxMessageSize:
+                print('Skipping message %d: %d bytes is over the %d byte limit' % (num, size, maxMessageSize))
+                skipped.append(num)
+                continue
+
+            route = None
+            if routeMessage != None:
+                route = routeMessage(email.message_from_bytes(literal or b''))
+                if route == None:
+                    skipped.append(num)
+                    continue
+            routes[num] = route
+
+        if skipped:
+            imapCommand(M, useUid, 'STORE', toMessageSet(skipped), '+FLAGS', '\\Seen')
+
+        if not routes:
+            continue
+
+        if perSecond:
+            if firstDownload == None:
+                firstDownload = time.monotonic()
+            wait = firstDownload + downloaded / perSecond - time.monotonic()
+            if wait > 0:
+                time.sleep(wait)
+            downloaded += len(routes)
+        typ, data = imapCommand(M, useUid, 'FETCH', toMessageSet(sorted(routes)), '(RFC822)')
+        for num, header, literal in fetchResponseItems(data, useUid):
+            if literal != None:
+                yield num, routes[num], literal
+
+
+# Without useUid (no checkpoint store), the messages to read are the UNSEEN
+# messages of the selected mailbox. With useUid and lastUid, they are every message
+# whose UID is greater than lastUid, whether it was opened or not. With useUid and
+# no lastUid (a checkpoint that starts now), they are the UNSEEN messages, and the
+# checkpoint starts after the newest message. Returns (highest UID, message numbers
+# or UIDs): the highest UID that will have been read (None without useUid) and the
+# messages.
+def messagesToRead(M, lastUid=None, useUid=False):
+    if not useUid:
+        typ, data = M.search(None, '(UNSEEN)')     # Adding 'UNSEEN' only reads unread emails
+        return None, data[0].split()
+
+    if lastUid == None:
+        return newCheckpointUids(M)
+
+    messageNumbers = newMessageUids(M, lastUid)
+    return max(messageNumbers, default=lastUid), messageNumbers
+
+
+# A mailbox without a checkpoint was read by UNSEEN until now, so only its UNSEEN
+# messages are new. Returns (UID of the newest message, UIDs of the UNSEEN ones).
+def newCheckpointUids(M):
+    typ, data = M.uid('SEARCH', None, '(UNSEEN)')
+    unseen = sorted(int(uid) for uid in data[0].split())
+    typ, data = M.uid('SEARCH', None, 'UID *')
+    return max([int(uid) for uid in data[0].split()] + unseen, default=0), unseen
+
+
+# The UIDs of the messages that arrived after lastUid
+def newMessageUids(M, lastUid):
+    # UID n:* always matches the newest message, even when its UID is below n
+    typ, data = M.uid('SEARCH', None, 'UID %d:*' % (lastUid + 1))
+    return [int(uid) for uid in data[0].split() if int(uid) > lastUid]
+
+
+# The checkpoint store remembers, for every mailbox, its UIDVALIDITY and the
+# highest UID that was read and written to the database. It is a small SQLite file.
+def openCheckpointStore(path):
+    store = sqlite3.connect(path)
+    store.execute('CREATE TABLE IF NOT EXISTS checkpoints (mailbox TEXT PRIMARY KEY, uidValidity INTEGER, lastUid INTEGER)')
+    store.commit()
+    return store
+
+
+# Returns (uidValidity, lastUid) for a mailbox, or (None, 0) if it was never read
+def loadCheckpoint(store, mailbox):
+    row = store.execute('SELECT uidValidity, lastUid FROM checkpoints WHERE mailbox = ?', (mailbox,)).fetchone()
+    if row == None:
+        return None, 0
+    return row
+
+
+def saveCheckpoint(store, mailbox, uidValidity, lastUid):
+    store.execute('INSERT OR REPLACE INTO checkpoints (mailbox, uidValidity, lastUid) VALUES (?, ?, ?)', (mailbox, uidValidity, lastUid))
+    store.commit()
+
+
+def imapConnect(emailAddress, password, mailbox='dataOther'):
+    M = imaplib.IMAP4_SSL('imap.gmail.com')
+    M.login(emailAddress, password)
+    M.select(mailbox) # This is the email folder / label you read emails
+                            # I have set up my email filters such that emails
+                            # with food availability info are automatically
+                            # forwarded to a folder I want to download from.
+                            # Folder's name is dataOther in this case
+    return M
+
+
+# UIDs are only meaningful while the mailbox's UIDVALIDITY stays the same. If the
+# server changed it, the saved UID is useless and the whole mailbox is read again.
+# Returns (UIDVALIDITY of the selected mailbox, UID to read after): lastUid, 0
+# when the UIDVALIDITY saved with it is not the mailbox's, or None when no
+# checkpoint was ever saved (see messagesToRead)
+def checkUidValidity(M, savedUidValidity, lastUid):
+    typ, data = M.response('UIDVALIDITY')
+    uidValidity = int(data[0])
+    if savedUidValidity == None:
+        lastUid = None
+    elif savedUidValidity != uidValidity:
+        lastUid = 0
+    return uidValidity, lastUid
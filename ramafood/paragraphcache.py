@@ -0,0 +1,116 @@
+# SQLite cache of the analysis of repeated digest and CSI paragraphs
+import hashlib
+import json
+import os
+import sqlite3
+import time
+
+from ramafood import stats, food
+
+
+# Paragraph cache. The Daily Digest and the CSI Weekend Edition repeat the same
+# blocks for days, so the result of analyzing a block is stored in SQLite, keyed
+# by a hash of the block with its whitespace normalized. A block seen before then
+# costs one lookup instead of html2text, the food rules and the date search.
+# Results are stored as JSON. Entries unused for maxAgeDays, and the least recently
+# used entries beyond maxEntries, are evicted when the cache is opened. Every
+# process (the parser workers too) opens its own connection the first time it
+# needs one. Bump paragraphCacheVersion whenever the parsing rules change, so
+# that old results aren't reused.
+#
+# Hits and new results are kept in memory while an email is parsed and written in
+# one short transaction afterwards (commitParagraphCache). A write transaction left
+# open during a parse would lock out the other parser processes until it ended.
+paragraphCacheVersion = 4
+paragraphCachePath = None
+paragraphCacheConnection = None
+paragraphCacheProcess = None
+pendingHits = []            # keys
+pendingAnalyses = dict()    # key -> analysis as JSON
+
+def openParagraphCache(path, maxEntries=100000, maxAgeDays=60):
+    global paragraphCachePath
+    paragraphCachePath = path
+
+    cache = paragraphCache()
+    cache.execute('DELETE FROM paragraphs WHERE usedAt < ?', (time.time() - maxAgeDays * 24 * 3600,))
+    cache.execute('DELETE FROM paragraphs WHERE key NOT IN (SELECT key FROM paragraphs ORDER BY usedAt DESC LIMIT ?)', (maxEntries,))
+    cache.commit()
+    return cache
+
+
+# The connection of this process, or None when there is no cache
+def paragraphCache():
+    global paragraphCacheConnection, paragraphCacheProcess
+    if paragraphCachePath == None:
+        return None
+
+    if paragraphCacheProcess != os.getpid():
+        # A forked worker starts without the parent's pending writes
+        del pendingHits[:]
+        pendingAnalyses.clear()
+        paragraphCacheConnection = sqlite3.connect(paragraphCachePath, timeout=30)
+        paragraphCacheConnection.execute('PRAGMA journal_mode=WAL')
+        paragraphCacheConnection.execute('CREATE TABLE IF NOT EXISTS paragraphs (key TEXT PRIMARY KEY, analysis TEXT, usedAt REAL, hits INTEGER)')
+        paragraphCacheProcess = os.getpid()
+    return paragraphCacheConnection
+
+
+# Returns analyzeAll(paragraphs), a list with the analysis of every paragraph,
+# taking from the cache the paragraphs of the same kind that were analyzed before
+# with the same food engine. analyzeAll is called once, with the paragraphs that
+# were not, so that the food engine scores them all together.
+def cachedParagraphAnalyses(kind, paragraphs, analyzeAll):
+    cache = paragraphCache()
+    if cache == None:
+        return analyzeAll(paragraphs)
+
+    if food.foodEngine != 'regex':
+        kind = '%s/%s' % (kind, food.foodEngineKey())
+
+    analyses = []
+    missed = dict()     # key -> paragraph
+    for paragraph in paragraphs:
+        normalized = ' '.join(paragraph.split())
+        key = hashlib.sha1(('%d\x1f%s\x1f%s' % (paragraphCacheVersion, kind, normalized)).encode('utf-8')).hexdigest()
+        analysisJson = pendingAnalyses.get(key)
+        if analysisJson == None and key not in missed:
+            row = cache.execute('SELECT analysis FROM paragraphs WHERE key = ?', (key,)).fetchone()
+            analysisJson = row[0] if row != None else None
+        if analysisJson != None:
+            pendingHits.append(key)
+            if stats.stageStats != None:
+                stats.stageStats['paragraphCache']['hits'] += 1
+        else:
+            missed[key] = paragraph
+        analyses.append((key, analysisJson))
+
+    if missed:
+        for key, analysis in zip(missed, analyzeAll(list(missed.values()))):
+            pendingAnalyses[key] = json.dumps(analysis)
+        if stats.stageStats != None:
+            stats.stageStats['paragraphCache']['misses'] += len(missed)
+    return [json.loads(analysisJson if analysisJson != None else pendingAnalyses[key]) for key, analysisJson in analyses]
+
+
+# Writes this process's pending hits and results to disk, in one transaction.
+# Called once per email, whether its parse succeeded or not.
+def commitParagraphCache():
+    cache = paragraphCache()
+    if cache == None or not (pendingHits or pendingAnalyses):
+        return
+
+    now = time.time()
+    with cache:
+        cache.executemany('INSERT OR REPLACE INTO paragraphs (key, analysis, usedAt, hits) VALUES (?, ?, ?, 0)',
+                          ((key, analysisJson, now) for key, analysisJson in pendingAnalyses.items()))
+        cache.executemany('UPDATE paragraphs SET usedAt = ?, hits = hits + 1 WHERE key = ?', ((now, key) for key in pendingHits))
+    del pendingHits[:]
+    pendingAnalyses.clear()
+
+
+# Returns (entries, hits) over the whole life of the cache
+def paragraphCacheTotals():
+    cache = paragraphCache()
+    entries, hits = cache.execute('SELECT count(*), coalesce(sum(hits), 0) FROM paragraphs').fetchone()
+    return entries, hits
@@ -0,0 +1,340 @@
+# Parsers for the Daily Digest, the CSI Weekend Edition and free-form emails, and
+# the router that picks one by the headers of an email. This is everything a
+# parser process needs, and it imports none of the IMAP or MongoDB code.
+import cProfile
+import email
+import re
+import time
+
+from ramafood import stats, guard
+from ramafood.stats import instrumented, newStageStats, recordStage
+from ramafood.text import htmlToText, textToMarkdown, removeAllNewLinesExceptParagraphChanges, beautifyText, removeSignature, previous_and_next
+from ramafood.food import classifyFoodParagraphs
+from ramafood.dates import findEventDate, findEventDateString, resolveEventDate
+from ramafood.events import Event
+from ramafood.paragraphcache import cachedParagraphAnalyses, commitParagraphCache
+from ramafood.guard import capText, checkBudget
+
+
+# Yields the CSI events in paragraphs, skipping the paragraphs not about food
+def findCSIEvents(paragraphs):
+    for analysis in cachedParagraphAnalyses('csi', paragraphs, analyzeCSIParagraphs):
+        if analysis != None:
+            # The date is kept as written too: the Weekend Edition's dates have no year
+            title, eventDetails, eventDate = analysis
+            yield Event(title, eventDate, eventDetails, eventDate)
+
+
+# The expensive part of findCSIEvents, which is what the paragraph cache stores:
+# for every paragraph None, or [title, event details, date string]. The food
+# engine scores all the paragraphs in one call.
+def analyzeCSIParagraphs(paragraphs):
+    return [analyzeCSIParagraph(par) if isFood else None
+            for par, isFood in zip(paragraphs, classifyFoodParagraphs(paragraphs))]
+
+
+def analyzeCSIParagraph(paragraph):
+    #Get the date and time if possible. If time is not possible or getting time would be unusually slow, don't get time
+    #As soon as you get the date for event, break
+    #The event details is the paragraph itself
+    checkBudget()
+    months = ('January', 'February', 'March', 'April', 'May', 'June', 'July', 'August', 'September', 'October', 'November', 'December') #spell check?. What if Jan or Feb
+    par = paragraph
+    eventDate = ''
+
+    for previous, item, nxt in previous_and_next(paragraph):
+        if item in months:
+            eventDate = previous + ' '+ item + ' ' + nxt
+            break
+
+    eventDate = eventDate.replace("^", "") #Maybe do more? Remove anything other than th, nd, st and numbers
+    beautifulText = removeAllNewLinesExceptParagraphChanges(par)
+    return ['CSI Event', beautifulText, eventDate]
+
+
+# Daily Digest emails are sent out to every Ramapo College student almost everyday
+# during Fall and Spring semesters. The type of emails that has decent amount of
+# food avaibility information.
+# To do: Make this function more scalable. At times, this function depends on
+# email's characteristics that are only specific to Ramapo College
+# Yields the events in digest entries, skipping the entries not about food
+def findDailyDigestEvents(paragraphs):
+    for analysis in cachedParagraphAnalyses('digest', paragraphs, analyzeDailyDigestParagraphs):
+        if analysis != None:
+            title, eventDetails, dateKind, dateString = analysis
+            yield Event(title, resolveEventDate(dateKind, dateString), eventDetails)
+
+
+# The expensive part of findDailyDigestEvents, which is what the paragraph cache
+# stores: for every entry None, or [title, event details, kind of date, date
+# string]. The food engine scores the bodies of all the entries in one call.
+def analyzeDailyDigestParagraphs(paragraphs):
+    bodies = [digestEntryBody(i) for i in paragraphs]
+    return [analyzeDailyDigestParagraph(paragraph, body) if isFood else None
+            for paragraph, body, isFood in zip(paragraphs, bodies, classifyFoodParagraphs(bodies))]
+
+
+def analyzeDailyDigestParagraph(paragraph, body):
+    #Get the date and time if possible. If time is not possible or getting time would be unusually slow, don't get time
+    #As soon as you get the date for event, break
+    #The event details is the paragraph itself minus the first line. The first line is title
+    checkBudget()
+    lines = paragraph.split('\n') #Break up the paragraph into multiple lines. Don't parse the first and the last line
+    title = lines[1]
+    #print("Title is : ", html2text.html2text(title) )
+
+    dateKind, dateString = findEventDateString(body)
+    if dateKind != None:
+        beautifulText = removeAllNewLinesExceptParagraphChanges(body)
+        return [title, beautifulText, dateKind, dateString]
+    return None
+
+
+# A digest entry without its title line and the last line
+def digestEntryBody(paragraph):
+    checkBudget()
+    return textToMarkdown('\n'.join(paragraph.split('\n')[2:-1]))
+
+
+def sizeOfDecodedPart(args, result):
+    return len(result) if result != None else 0
+
+
+@instrumented('walk', sizeOfDecodedPart)
+def decodePart(part):
+    return part.get_payload(decode=True)
+
+
+# Text parts whose encoded payload is bigger than this are skipped without being
+# decoded. Nobody announces pizza in a megabyte of text.
+maxTextPartSize = 1024 * 1024
+
+
+# Returns the text of a text part, decoded with the charset the part declares, or
+# None when the part is too big or can't be decoded. Parts without a charset, or
+# with one Python doesn't know or that doesn't fit the bytes, are tried as UTF-8.
+def partText(part):
+    if len(part.get_payload()) > maxTextPartSize:
+        return None
+
+    body = decodePart(part) #to control automatic email-style MIME decoding (e.g., Base64, uuencode, quoted-printable)
+    if body == None:
+        return None
+
+    for charset in (part.get_content_charset(), 'utf-8'):
+        if charset != None:
+            try:
+                return body.decode(charset)
+            except (LookupError, UnicodeDecodeError):
+                continue
+    return None
+
+
+# Serially go through all text parts of an email. This function does not
+# parse food avaibility information from images, html text and fancy stuff like
+# that. However, the function can still parse food avaibility information from
+# 99% emails that I choose to parse information from
+# Yields the text of every part, one part at a time. Only text/* parts are ever
+# decoded: images, PDFs and other attachments are skipped by their content type.
+def textParts(msg):
+    plainTextCount = 0
+
+    for part in msg.walk():
+        if part.get_content_type() == "text/plain":
+            body = partText(part)
+            if body != None:
+                plainTextCount += 1
+                yield body
+
+    # The walk above should go through 80% of emails. However, you need to repeat
+    # the same walk but a little differently to go through around 19% of emails.
+    # 1% emails have just pictures or annoyingly fancy texts. I am okay with
+    # my program not parsing those emails.
+    if plainTextCount == 0: #Need to parse this msg in a different way
+        for part in msg.walk():
+            if part.get_content_maintype() == 'text':
+                body = partText(part)
+                if body != None:
+                    yield htmlToText(body)    # Once for the whole part
+
+
+#Based on CSI Weekend Edition for the past 20 months, Weekend Edition email has a familiar pattern
+#The program breaks an email to paragraphs. Based on emails' pattern, the first 3 and the last 7 paragraphs are useless as
+# they don't form the body of the email
+def csiParagraphs(msg):
+    for i in textParts(msg):
+        paragraph = re.split('\n(?=[A-Z])', i)
+
+        for j in range(3, (len(paragraph) - 7)):   #Parse this part for date and event details
+            checkBudget()
+            yield capText(paragraph[j], guard.maxParagraphLength, 'paragraphLength')
+
+
+def parseCSIWeekendEmails(msg):
+    return findCSIEvents(list(csiParagraphs(msg)))
+
+
+#Based on Ramapo Daily Digest email for the past 20 months, Ramapo Digest email has a familiar pattern
+#The program splits a complete email body based on a peculiar trait. Every event in Ramapo digest email in the past
+#24 months is separated by 60 '-' characters. So, if you split the email body based on this trait, you can efficiently
+#get individual email data. Is this approach scalable? No. But, in the present context, is this efficient? Yes
+#Does it do the job? Yes.
+def dailyDigestParagraphs(msg):
+    splitCharacter = 60 * '-'
+    for i in textParts(msg):
+        paragraph = i.split(splitCharacter)
+
+        # We can ignore the first two elements of a paragraph because they don't contain any data relevant for
+        # food event parsing. Similarly, we can ignore the last element for the same reason
+        for j in range(2, (len(paragraph) - 1)):   #Parse this part for date and event details
+            checkBudget()
+            yield capText(paragraph[j], guard.maxParagraphLength, 'paragraphLength')
+
+
+def parseDailyDigestEmails(msg):
+    return findDailyDigestEvents(list(dailyDigestParagraphs(msg)))
+
+
+# Significant (around 35-40%) food availability information come from ramapo digest emails and
+# CSI Weekend Edition emails. Residence halls and some clubs don't necessarily
+# advertise their events on Ramapo Digest or on CSI Weekend emails. The function
+# below identifies food avaibility info from these emails. These emails are tricky to parse
+# because they don't have a standard format.
+# Returns the event in body, which the food engine found to be about food, or None
+# when there is no date in it.
+def findOtherEvent(body, emailSubject):
+    title = htmlToText(emailSubject)
+
+    body = beautifyText(body)
+    eventDate = findEventDate(body)
+    if eventDate != '':
+        beautifulText = removeAllNewLinesExceptParagraphChanges(body)
+        return Event(title, eventDate, beautifulText)
+    return None
+
+
+def otherEmailBodies(msg):
+    for i in textParts(msg):
+        checkBudget()
+        yield removeSignature(capText(i, guard.maxBodyLength, 'bodyLength'))
+
+
+# The food engine scores all the text parts of the email in one call
+def parseOtherEmails(msg, emailSubject):
+    bodies = list(otherEmailBodies(msg))
+    for body, isFood in zip(bodies, classifyFoodParagraphs(bodies)):
+        if isFood:
+            checkBudget()
+            event = findOtherEvent(body, emailSubject)
+            if event != None:
+                yield event
+
+
+# Routing table for fetched emails. Each route is (route name, header, compiled
+# regex, parser). The first route whose regex matches the header wins and emails
+# that match no route go to parseOtherEmails. A route without a parser means the
+# email is skipped, so its body is never downloaded. Every parser is called as
+# parser(msg, subject) and yields the events it finds.
+emailRoutes = (
+    ('digest', 'From', re.compile(r'digest@ramapo\.edu'),
+        lambda msg, subject: parseDailyDigestEmails(msg)),
+    ('csiWeekend', 'Subject', re.compile(r'Weekend[^a-z]{2,4}Edition'),
+        lambda msg, subject: parseCSIWeekendEmails(msg)),
+    ('publicSafety', 'Subject', re.compile(r'Public[^a-z]{2,4}Safety[^a-z]{2,4}Newsletter'), None),
+)
+otherEmailRoute = ('other', None, None, parseOtherEmails)
+
+# Worker processes get the route name only (the parsers are lambdas, which can't
+# be pickled) and look the parser up here
+emailParsers = dict((route[0], route[3]) for route in emailRoutes + (otherEmailRoute,))
+
+
+# Picks the route for an email from its headers (msg can be a full message or just
+# the headers). Returns None when the email should be skipped.
+def routeEmail(msg):
+    for route in emailRoutes:
+        routeName, headerName, pattern, parser = route
+        if pattern.search(msg[headerName] or ''):
+            return route if parser != None else None
+    return otherEmailRoute
+
+
+# Yields the texts of a raw email that the food engine looks at, the way its
+# parser hands them over. This is what the food model is trained on.
+def foodCheckedParagraphs(rawMessage):
+    msg = email.message_from_bytes(rawMessage)
+    route = routeEmail(msg)
+    if route == None:
+        return
+    routeName = route[0]
+    if routeName == 'digest':
+        for paragraph in dailyDigestParagraphs(msg):
+            yield digestEntryBody(paragraph)
+    elif routeName == 'csiWeekend':
+        yield from csiParagraphs(msg)
+    else:
+        yield from otherEmailBodies(msg)
+
+
+# Parses one raw email with the parser of its route and returns the events found.
+# This is what runs in the worker processes, so it must not touch module globals
+# (other than the worker's own stats.stageStats, see parseRawMessageWithStats).
+# With the guard on, an email that is too slow to parse or that breaks a parser
+# gives no events and is quarantined (see guard.py).
+def parseRawMessage(routeName, rawMessage):
+    try:
+        if guard.guardEnabled:
+            return guard.guardedParse(parseMessageEvents, routeName, rawMessage)
+        return parseMessageEvents(routeName, rawMessage)
+    finally:
+        commitParagraphCache()
+
+
+def parseMessageEvents(routeName, rawMessage):
+    #print('Message %s\n' % rawMessage)
+    # From bytes: every part is decoded with its own charset (see partText)
+    msg = email.message_from_bytes(rawMessage)
+    subject = msg['Subject']
+    if subject == None:
+        subject = ''
+
+    #subject = decode_header(msg['Subject'])
+    #subject = str(msg['Subject'][0][0], 'utf-8')  #Convert byte object subject[0][0] to a decoded string object
+
+    events = list(emailParsers[routeName](msg, subject))
+    for oneEvent in events:
+        oneEvent.setSource(routeName)
+    return events
+
+
+# parseRawMessage with instrumentation on. Parses one email with fresh statistics,
+# and under cProfile when profile is set, so that a worker process can send
+# everything back to the parent. Returns (events, statistics, seconds, profile),
+# where profile is the profiler's stats dict or None.
+def parseRawMessageWithStats(routeName, rawMessage, profile=False):
+    outerStats = stats.stageStats
+    stats.stageStats = newStageStats()
+    profiler = cProfile.Profile() if profile else None
+
+    try:
+        started = time.perf_counter()
+        if profiler != None:
+            profiler.enable()
+        events = parseRawMessage(routeName, rawMessage)
+        if profiler != None:
+            profiler.disable()
+        seconds = time.perf_counter() - started
+
+        recordStage('parse ' + routeName, seconds, len(rawMessage))
+        stats.stageStats['messages'][routeName] += 1
+        stats.stageStats['bytes'][routeName] += len(rawMessage)
+        stats.stageStats['events'][routeName] += len(events)
+        messageStats = stats.stageStats
+    finally:
+        stats.stageStats = outerStats
+
+    profileStats = None
+    if profiler != None:
+        profiler.create_stats()
+        profileStats = profiler.stats
+    return events, messageStats, seconds, profileStats
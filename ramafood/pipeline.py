@@ -0,0 +1,123 @@
+# Parsing streams of raw emails, in a process pool when there is more than one
+# worker, and replaying emails saved in files
+import mailbox
+import os
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from email.parser import BytesHeaderParser
+
+from ramafood import stats, food, paragraphcache, guard
+from ramafood.stats import mergeStageStats, rememberSlowMessage
+from ramafood.parsers import parseRawMessage, parseRawMessageWithStats, routeEmail
+
+
+# The settings of this process that the parser processes need. Workers don't get
+# them by inheriting module globals, which only works when the pool forks them:
+# initializeWorker applies them in every worker, whether the pool starts workers
+# with fork, forkserver or spawn.
+def workerSettings():
+    return {'foodEngine': food.foodEngine, 'foodModelPath': food.foodModelPath, 'paragraphCachePath': paragraphcache.paragraphCachePath,
+            'guard': (guard.messageCpuBudget, guard.quarantineDir) if guard.guardEnabled else None,
+            'guardCaps': (guard.maxParagraphLength, guard.maxBodyLength)}
+
+
+def initializeWorker(settings):
+    if settings['foodEngine'] != food.foodEngine:
+        food.useFoodEngine(settings['foodEngine'], settings['foodModelPath'])
+    # The parent opened the cache and evicted old entries, a worker only connects
+    paragraphcache.paragraphCachePath = settings['paragraphCachePath']
+    guard.maxParagraphLength, guard.maxBodyLength = settings['guardCaps']
+    if settings['guard'] != None:
+        guard.useGuard(*settings['guard'])
+
+
+# A process pool of parser workers with this process's settings
+def newParserPool(workers):
+    return ProcessPoolExecutor(max_workers=workers, initializer=initializeWorker, initargs=(workerSettings(),))
+
+
+# Parses (message number, route name, raw message) tuples and yields
+# (message number, events) in the same order as the input, whatever order the
+# workers finish in. Every event gets its message number as messageUid, and the
+# events of one call share their repeated titles and details (Event.shareTexts). With more
+# than one worker, messages are parsed in a process pool. At most 4 messages per
+# worker are in flight, so a big backlog doesn't sit in memory while it waits for a
+# worker. With instrumentation on, the statistics of every email are merged into
+# stats.stageStats.
+def parseMessages(messages, workers=1):
+    collectStats = stats.stageStats != None
+    profile = collectStats and stats.stageStats['profileSlowest'] > 0
+    texts = dict()
+
+    def parsed(num, result):
+        if collectStats:
+            events, messageStats, seconds, profileStats = result
+            mergeStageStats(stats.stageStats, messageStats)
+            if profile:
+                rememberSlowMessage(num, seconds, profileStats)
+        else:
+            events = result
+        for oneEvent in events:
+            oneEvent.messageUid = num
+            oneEvent.shareTexts(texts)
+        return num, events
+
+    if workers <= 1:
+        for num, routeName, rawMessage in messages:
+            if collectStats:
+                yield parsed(num, parseRawMessageWithStats(routeName, rawMessage, profile))
+            else:
+                yield parsed(num, parseRawMessage(routeName, rawMessage))
+        return
+
+    with newParserPool(workers) as executor:
+        inFlight = deque()
+        for num, routeName, rawMessage in messages:
+            if collectStats:
+                future = executor.submit(parseRawMessageWithStats, routeName, rawMessage, profile)
+            else:
+                future = executor.submit(parseRawMessage, routeName, rawMessage)
+            inFlight.append( (num, future) )
+            if len(inFlight) >= 4 * workers:
+                num, future = inFlight.popleft()
+                yield parsed(num, future.result())
+
+        while inFlight:
+            num, future = inFlight.popleft()
+            yield parsed(num, future.result())
+
+
+# Yields the raw bytes of every email stored in paths, in a stable order. A path
+# can be a .eml file, an mbox file, a Maildir (a directory with cur, new and tmp)
+# or a directory holding any of those.
+def readMessageFiles(paths):
+    for path in paths:
+        if os.path.isdir(path):
+            if all(os.path.isdir(os.path.join(path, i)) for i in ('cur', 'new', 'tmp')):
+                maildir = mailbox.Maildir(path, factory=None, create=False)
+                for key in sorted(maildir.keys()):
+                    yield maildir.get_bytes(key)
+            else:
+                yield from readMessageFiles(os.path.join(path, i) for i in sorted(os.listdir(path)))
+        elif path.endswith('.eml'):
+            with open(path, 'rb') as emlFile:
+                yield emlFile.read()
+        else:
+            mbox = mailbox.mbox(path, factory=None, create=False)
+            for key in mbox.keys():
+                yield mbox.get_bytes(key)
+
+
+# Offline replay: runs emails saved in files through the same route -> walk -> parse
+# steps as emails read from Gmail, without any network or database. Yields the events.
+def replayMessageFiles(paths, workers=1):
+    headerParser = BytesHeaderParser()
+
+    def routedMessages():
+        for num, rawMessage in enumerate(readMessageFiles(paths), 1):
+            route = routeEmail(headerParser.parsebytes(rawMessage))
+            if route != None:
+                yield num, route[0], rawMessage
+
+    for num, events in parseMessages(routedMessages(), workers):
+        yield from events
@@ -0,0 +1,174 @@
+# Reading several mailboxes at once: labels of the main Gmail account and club
+# accounts, through a bounded pool of IMAP sessions. Every source has its own
+# checkpoint and rate limit. The emails of all sources go through one parser pool
+# and their events come out as one stream for one database writer.
+import queue
+import threading
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+
+from ramafood.parsers import routeEmail
+from ramafood.pipeline import parseMessages
+from ramafood.imap import imapConnect, fetchMessages, messagesToRead, checkUidValidity, loadCheckpoint
+
+
+# A source is a dict: name (what the throughput report calls it), emailAddress,
+# password, mailbox, and rateLimit, the most messages a second to download from it
+# (0 for no limit). Its checkpoint is saved under emailAddress/mailbox.
+def mailboxSource(name, emailAddress, password, mailbox='dataOther', rateLimit=0):
+    return {'name': name, 'emailAddress': emailAddress, 'password': password, 'mailbox': mailbox, 'rateLimit': rateLimit}
+
+
+def sourceCheckpointKey(source):
+    return source['emailAddress'] + '/' + source['mailbox']
+
+
+def connectSource(source):
+    return imapConnect(source['emailAddress'], source['password'], source['mailbox'])
+
+
+# The session pool. Every thread of the IMAP thread pool keeps its session for the
+# next source of the same account, which then only needs a SELECT, and logs it out
+# when it moves to another account. So there are never more sessions open than
+# threads. sessions maps a thread to (account, session).
+def sourceSession(sessions, sessionsLock, source, connect):
+    thread = threading.get_ident()
+    with sessionsLock:
+        account, M = sessions.pop(thread, (None, None))
+
+    if M != None and account == source['emailAddress']:
+        M.select(source['mailbox'])
+    else:
+        if M != None:
+            closeSession(M)
+        M = connect(source)
+
+    with sessionsLock:
+        sessions[thread] = (source['emailAddress'], M)
+    return M
+
+
+def closeSession(M):
+    try:
+        M.logout()
+    except Exception:
+        pass
+
+
+# Puts item in messagesOut, unless the reader stopped reading
+def putUnlessStopped(messagesOut, stop, item):
+    while not stop.is_set():
+        try:
+            messagesOut.put(item, timeout=0.5)
+            return True
+        except queue.Full:
+            continue
+    return False
+
+
+# Runs in the IMAP thread pool. Downloads the new emails of one source into
+# messagesOut as (message, route name, raw message), where message is
+# "source name-UID" (or message number), and returns the checkpoint to save,
+# or None without a saved checkpoint (then new means UNSEEN).
+def readSource(source, savedCheckpoint, sessions, sessionsLock, connect, messagesOut, stop, chunkSize, maxMessageSize, throughput):
+    started = time.perf_counter()
+    M = sourceSession(sessions, sessionsLock, source, connect)
+    try:
+        uidValidity = lastUid = None
+        if savedCheckpoint != None:
+            uidValidity, lastUid = checkUidValidity(M, *savedCheckpoint)
+        highestUid, messageNumbers = messagesToRead(M, lastUid, savedCheckpoint != None)
+
+        fetched = fetchMessages(M, messageNumbers, chunkSize, maxMessageSize, routeEmail, savedCheckpoint != None, source['rateLimit'])
+        for num, route, rawMessage in fetched:
+            if not putUnlessStopped(messagesOut, stop, ('%s-%s' % (source['name'], num), route[0], rawMessage)):
+                return None
+            throughput['messages'] += 1
+            throughput['bytes'] += len(rawMessage)
+    except BaseException:
+        # The session may be broken half way through a command
+        with sessionsLock:
+            sessions.pop(threading.get_ident(), None)
+        closeSession(M)
+        raise
+    finally:
+        throughput['seconds'] += time.perf_counter() - started
+
+    if savedCheckpoint == None:
+        return None
+    return (sourceCheckpointKey(source), uidValidity, highestUid)
+
+
+# Yields (message, route name, raw message) from all sources, maxSessions sources
+# at a time, in whatever order they arrive. A source that fails is reported and
+# skipped; the others go on. The checkpoints of the sources that were read to the
+# end are appended to checkpoints when the last message has been yielded.
+def sourceMessages(sources, savedCheckpoints, connect, maxSessions, chunkSize, maxMessageSize, checkpoints, throughput):
+    messagesOut = queue.Queue(maxsize=chunkSize)
+    stop = threading.Event()
+    sessions = dict()
+    sessionsLock = threading.Lock()
+
+    def readUntilDone(source):
+        try:
+            return readSource(source, savedCheckpoints[source['name']], sessions, sessionsLock, connect, messagesOut, stop,
+                              chunkSize, maxMessageSize, throughput[source['name']])
+        finally:
+            putUnlessStopped(messagesOut, stop, None)
+
+    imapThreads = ThreadPoolExecutor(max_workers=maxSessions, thread_name_prefix='imap')
+    try:
+        futures = [(source, imapThreads.submit(readUntilDone, source)) for source in sources]
+        running = len(futures)
+        while running:
+            message = messagesOut.get()
+            if message == None:
+                running -= 1
+            else:
+                yield message
+
+        for source, future in futures:
+            if future.exception() != None:
+                print('Could not read %s (%s): %s' % (source['name'], sourceCheckpointKey(source), future.exception()))
+                throughput[source['name']]['failed'] = 1
+            elif future.result() != None and checkpoints != None:
+                checkpoints.append(future.result())
+    finally:
+        stop.set()
+        imapThreads.shutdown(wait=True)
+        for account, M in sessions.values():
+            closeSession(M)
+
+
+# Reads the new emails of every source concurrently and yields the events of all
+# of them, parsed by `workers` processes. Without a checkpoint store, new means
+# UNSEEN. With one, new means a UID above the source's saved checkpoint, and the
+# checkpoints to save are appended to checkpoints as (mailbox, uidValidity, lastUid)
+# once every source has been read. The caller saves them only after the events are
+# written to the database, so a crash in between reads the same emails again on
+# the next run (the database writer ignores events it already has). throughput (a dict) gets a Counter per source name
+# with its messages, bytes, events and seconds, see throughputReport.
+def performSourceOperations(sources, chunkSize=200, maxMessageSize=10 * 1024 * 1024, checkpointStore=None, workers=1,
+                            maxSessions=4, checkpoints=None, throughput=None, connect=connectSource):
+    if throughput == None:
+        throughput = dict()
+    for source in sources:
+        throughput[source['name']] = Counter()
+    # SQLite connections stay in the thread that made them, so the checkpoints are loaded here
+    savedCheckpoints = dict((source['name'], loadCheckpoint(checkpointStore, sourceCheckpointKey(source)) if checkpointStore != None else None)
+                            for source in sources)
+
+    messages = sourceMessages(sources, savedCheckpoints, connect, max(maxSessions, 1), chunkSize, maxMessageSize, checkpoints, throughput)
+    for num, events in parseMessages(messages, workers):
+        throughput[num.rsplit('-', 1)[0]]['events'] += len(events)
+        yield from events
+
+
+def throughputReport(throughput):
+    lines = ['%-20s %9s %9s %7s %9s %9s' % ('source', 'messages', 'KB', 'events', 'seconds', 'msg/s')]
+    for name, counts in throughput.items():
+        rate = counts['messages'] / counts['seconds'] if counts['seconds'] else 0
+        lines.append('%-20s %9d %9d %7d %9.2f %9.1f%s' % (name[:20], counts['messages'], counts['bytes'] // 1024, counts['events'],
+                                                         counts['seconds'], rate, '  failed' if counts['failed'] else ''))
+    return '\n'.join(lines)
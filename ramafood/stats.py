@@ -0,0 +1,164 @@
+# Instrumentation: per-stage timings and counters, and writing them out as JSON
+# or Prometheus text
+import json
+import marshal
+import os
+import re
+import time
+import heapq
+import threading
+from collections import Counter
+from functools import wraps
+from itertools import count
+
+
+# Instrumentation. stageStats is None unless a run asks for statistics, and every
+# instrumented function only checks that before doing its normal work, so the
+# cost when it is off is one global lookup per call. When it is on, stageStats
+# holds plain dicts and Counters (they have to be pickled back from the parser
+# processes):
+#   stages            stage -> [seconds, calls, bytes processed]
+#   messages, bytes   email type -> emails parsed, bytes parsed
+#   events            email type -> events produced
+#   foodRules         food rule that fired -> count
+#   dateIterations    "iteration <n>: <kind of date>" -> count
+#   paragraphCache    'hits' and 'misses' of the paragraph cache
+#   duplicates        email type -> events merged into an event seen before
+#   guardTrips        why the guard tripped (see guard.py) -> count
+#   slowestMessages   heap of the profileSlowest slowest emails and their profiles
+stageStats = None
+
+def newStageStats(profileSlowest=0):
+    return {
+        'stages': dict(),
+        'messages': Counter(),
+        'bytes': Counter(),
+        'events': Counter(),
+        'foodRules': Counter(),
+        'dateIterations': Counter(),
+        'paragraphCache': Counter(),
+        'duplicates': Counter(),
+        'guardTrips': Counter(),
+        'profileSlowest': profileSlowest,
+        'slowestMessages': []
+    }
+
+
+# The IMAP threads of sources.py record their stages at the same time, and += on
+# a list item is not atomic
+stageStatsLock = threading.Lock()
+
+def recordStage(stage, seconds, size=0):
+    with stageStatsLock:
+        totals = stageStats['stages'].setdefault(stage, [0.0, 0, 0])
+        totals[0] += seconds
+        totals[1] += 1
+        totals[2] += size
+
+
+def mergeStageStats(total, other):
+    for stage, (seconds, calls, size) in other['stages'].items():
+        totals = total['stages'].setdefault(stage, [0.0, 0, 0])
+        totals[0] += seconds
+        totals[1] += calls
+        totals[2] += size
+    for key in ('messages', 'bytes', 'events', 'foodRules', 'dateIterations', 'paragraphCache', 'duplicates', 'guardTrips'):
+        total[key].update(other[key])
+
+
+# Decorator that times every call of a function as one call of stage while
+# instrumentation is on. sizeOf(args, result) gives the bytes processed.
+def instrumented(stage, sizeOf=None):
+    def decorate(function):
+        @wraps(function)
+        def wrapper(*args):
+            if stageStats == None:
+                return function(*args)
+            started = time.perf_counter()
+            result = function(*args)
+            recordStage(stage, time.perf_counter() - started, sizeOf(args, result) if sizeOf != None else 0)
+            return result
+        return wrapper
+    return decorate
+
+
+def sizeOfFirstArgument(args, result):
+    return len(args[0])
+
+
+# Keeps the profiles of the profileSlowest slowest emails in stageStats
+messageSequence = count()
+
+def rememberSlowMessage(num, seconds, profileStats):
+    slowest = stageStats['slowestMessages']
+    heapq.heappush(slowest, (seconds, next(messageSequence), num, profileStats))
+    if len(slowest) > stageStats['profileSlowest']:
+        heapq.heappop(slowest)
+
+
+# A JSON-friendly summary of instrumentation statistics
+def stageStatsSummary(stats):
+    slowest = sorted(stats['slowestMessages'], reverse=True)
+    emailTypes = set(stats['messages']) | set(stats['events'])
+    return {
+        'stages': dict((stage, {'seconds': seconds, 'calls': calls, 'bytes': size})
+                       for stage, (seconds, calls, size) in sorted(stats['stages'].items())),
+        'emailTypes': dict((emailType, {'messages': stats['messages'][emailType], 'bytes': stats['bytes'][emailType],
+                                        'events': stats['events'][emailType]})
+                           for emailType in sorted(emailTypes)),
+        'foodRules': dict(stats['foodRules'].most_common()),
+        'dateIterations': dict(sorted(stats['dateIterations'].items())),
+        'paragraphCache': dict(stats['paragraphCache']),
+        'duplicates': dict(sorted(stats['duplicates'].items())),
+        'guardTrips': dict(sorted(stats['guardTrips'].items())),
+        'slowestMessages': [{'message': num, 'seconds': seconds} for seconds, sequence, num, profileStats in slowest]
+    }
+
+
+# Food rules are regexes, some with control characters in them. Those are written
+# as an escaped backslash followed by x and the character code.
+def prometheusLabel(value):
+    value = str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+    return re.sub(r'[\x00-\x1f]', lambda control: '\\\\x%02x' % ord(control.group()), value)
+
+
+# The same statistics in the Prometheus text exposition format
+def stageStatsPrometheus(stats):
+    lines = []
+
+    def metric(name, help, samples):
+        lines.append('# HELP ramafood_%s %s' % (name, help))
+        lines.append('# TYPE ramafood_%s counter' % name)
+        for labelName, labelValue, value in samples:
+            lines.append('ramafood_%s{%s="%s"} %s' % (name, labelName, prometheusLabel(labelValue), value))
+
+    stages = sorted(stats['stages'].items())
+    metric('stage_seconds_total', 'Wall time spent in each stage.', [('stage', stage, totals[0]) for stage, totals in stages])
+    metric('stage_calls_total', 'Calls of each stage.', [('stage', stage, totals[1]) for stage, totals in stages])
+    metric('stage_bytes_total', 'Bytes processed by each stage.', [('stage', stage, totals[2]) for stage, totals in stages])
+    metric('messages_total', 'Emails parsed per email type.', [('email_type', i, n) for i, n in sorted(stats['messages'].items())])
+    metric('message_bytes_total', 'Bytes of emails parsed per email type.', [('email_type', i, n) for i, n in sorted(stats['bytes'].items())])
+    metric('events_total', 'Events produced per email type.', [('email_type', i, n) for i, n in sorted(stats['events'].items())])
+    metric('food_rule_matches_total', 'Paragraphs classified as food by each rule.', [('rule', i, n) for i, n in sorted(stats['foodRules'].items())])
+    metric('date_iterations_total', 'Event dates found by each date iteration.', [('iteration', i, n) for i, n in sorted(stats['dateIterations'].items())])
+    metric('duplicate_events_total', 'Events merged into an event seen before, per email type.', [('email_type', i, n) for i, n in sorted(stats['duplicates'].items())])
+    metric('guard_trips_total', 'Times the guard capped a text or quarantined an email, per reason.', [('reason', i, n) for i, n in sorted(stats['guardTrips'].items())])
+    metric('paragraph_cache_total', 'Paragraph cache lookups by result.', [('result', i, n) for i, n in sorted(stats['paragraphCache'].items())])
+    return '\n'.join(lines) + '\n'
+
+
+# Writes the statistics to path: Prometheus text if path ends in .prom, JSON otherwise
+def writeStageStats(stats, path):
+    with open(path, 'w') as statsFile:
+        if path.endswith('.prom'):
+            statsFile.write(stageStatsPrometheus(stats))
+        else:
+            json.dump(stageStatsSummary(stats), statsFile, indent=2)
+
+
+# Writes one .prof file per slow email. Open them with pstats.Stats(path).
+def writeSlowestProfiles(stats, directory):
+    os.makedirs(directory, exist_ok=True)
+    for rank, (seconds, sequence, num, profileStats) in enumerate(sorted(stats['slowestMessages'], reverse=True), 1):
+        with open(os.path.join(directory, 'slowest-%02d-message-%s.prof' % (rank, num)), 'wb') as profileFile:
+            marshal.dump(profileStats, profileFile)
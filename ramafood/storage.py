@@ -0,0 +1,164 @@
+# MongoDB storage. pymongo is imported when a connection is made, not with this module.
+import hashlib
+
+from ramafood.stats import instrumented
+from ramafood.events import Event, eventTimezone
+from ramafood.dedup import newEventIndex, indexStoredEvents, deduplicateEvents
+from ramafood.feed import eventExpiry, ensureEventIndexes, publishFeed
+
+
+foodEventsTable = None  # This is the table in the MongoDB database in which
+                        # food events are stored. connect_to_db sets it.
+foodEventsFeed = None   # The feed the Android app reads (see feed.py)
+
+
+# The connection string parameter comes from the [database] section of the config.
+def connect_to_db(conn_str):
+    global foodEventsTable, foodEventsFeed
+    from pymongo import MongoClient
+    # Dates come back in Ramapo's time zone (they are stored in UTC)
+    client = MongoClient(conn_str, tz_aware=True, tzinfo=eventTimezone())
+    foodEventsTable = client.cmps364.foodEventsTable
+    foodEventsFeed = client.cmps364.foodEventsFeed
+    return client
+
+
+# A stable identity for an event: title + eventDate + a hash of the details.
+# Rerunning the script on the same emails produces the same fingerprints, so the
+# writer can upsert on it instead of inserting duplicates. Only the day of
+# eventDate counts: the dates found in emails have no time of day, and
+# parsedatetime fills in the time of the parse. A CSI date counts as its text.
+def eventFingerprint(event):
+    if event.dateText:
+        eventDate = event.dateText
+    elif event.eventDate != None:
+        eventDate = event.eventDate.date().isoformat()
+    else:
+        eventDate = ''
+
+    detailsHash = hashlib.sha1(event.eventDetails.encode('utf-8')).hexdigest()
+    key = '\x1f'.join((event.title, eventDate, detailsHash))
+    return hashlib.sha1(key.encode('utf-8')).hexdigest()
+
+
+# The unique index on the fingerprint. It is sparse because the documents the old
+# script inserted have no fingerprint, and a plain unique index counts all of them
+# as the same null fingerprint (a fingerprint is never null, so sparse leaves out
+# the same documents as {'$exists': True} would). create_index does nothing if it
+# already exists; a plain unique index made by an earlier version is replaced.
+def ensureFingerprintIndex(collection):
+    from pymongo.errors import OperationFailure
+    try:
+        collection.create_index('fingerprint', unique=True, sparse=True)
+    except OperationFailure:
+        collection.drop_index('fingerprint_1')
+        collection.create_index('fingerprint', unique=True, sparse=True)
+
+
+# Gives the documents the old script inserted their fingerprints, so that the
+# writer updates them instead of inserting the same events again. A document
+# whose fingerprint another one already has (the old script inserted an event
+# every time it read it) is left without one. Returns how many were fingerprinted.
+def fingerprintLegacyEvents(collection):
+    from pymongo.errors import DuplicateKeyError
+    ensureFingerprintIndex(collection)
+    fingerprinted = 0
+    for storedEvent in collection.find({'fingerprint': {'$exists': False}}):
+        try:
+            collection.update_one({'_id': storedEvent['_id']}, {'$set': {'fingerprint': eventFingerprint(Event.fromDocument(storedEvent))}})
+            fingerprinted += 1
+        except DuplicateKeyError:
+            continue
+    return fingerprinted
+
+
+# Writes events with unordered bulk upserts keyed on the event fingerprint (the one
+# stored with the event when it was read back from the database), batchSize
+# events per round trip. Returns how many events were
+# inserted, updated or skipped because they were already stored. A stored event is
+# only updated when it gets a new source, or a new expiry when it has no date:
+# everything else is what the fingerprint was made of, or the time of day of the
+# parse that found it first.
+def writeEvents(collection, events, batchSize=500):
+    from pymongo import UpdateOne
+    counts = {'inserted': 0, 'updated': 0, 'skipped': 0}
+    ensureFingerprintIndex(collection)
+
+    batch = []
+    for oneEvent in events:
+        if oneEvent.fingerprint == None:
+            oneEvent.fingerprint = eventFingerprint(oneEvent)
+        document = dict(oneEvent.document(), source=oneEvent.source, messageUid=oneEvent.messageUid)
+        # Sources are added, not set: the same event can be written twice in one
+        # unordered batch, once per source. The email it was first found in is kept.
+        update = {'$setOnInsert': document, '$addToSet': {'sources': {'$each': oneEvent.sources}}}
+        if oneEvent.eventDate != None:
+            document['expiresAt'] = eventExpiry(oneEvent.eventDate)
+        else:
+            update['$set'] = {'expiresAt': eventExpiry(None)}
+        batch.append(UpdateOne({'fingerprint': oneEvent.fingerprint}, update, upsert=True))
+
+        if len(batch) >= batchSize:
+            writeBatch(collection, batch, counts)
+            batch = []
+
+    if batch:
+        writeBatch(collection, batch, counts)
+
+    return counts
+
+
+@instrumented('mongoWrite')
+def writeBatch(collection, batch, counts):
+    from pymongo.errors import BulkWriteError
+    try:
+        result = collection.bulk_write(batch, ordered=False)
+        details = {
+            'nUpserted': result.upserted_count,
+            'nMatched': result.matched_count,
+            'nModified': result.modified_count,
+            'writeErrors': []
+        }
+    except BulkWriteError as error:
+        # Two copies of the same event in one batch can race on the upsert.
+        # The loser hits the unique index and is counted as skipped.
+        details = error.details
+        duplicateKeyErrors = [i for i in details['writeErrors'] if i['code'] == 11000]
+        if len(duplicateKeyErrors) != len(details['writeErrors']):
+            raise
+
+    counts['inserted'] += details['nUpserted']
+    counts['updated'] += details['nModified']
+    counts['skipped'] += details['nMatched'] - details['nModified'] + len(details['writeErrors'])
+
+
+# Writes events (any iterable, consumed batch by batch) to the MongoDB database
+# named in the [database] section of config, then rebuilds the feed. The feed is
+# also written to feedPath in the [feed] section, if there is one.
+def performDatabaseOperations(events, config):
+    connection_string = config['database']['mongo_connection']
+    batchSize = config.getint('database', 'batchSize', fallback=500)
+    # This establishes the connection, conn will be used across the lifetime of the program.
+    conn = connect_to_db(connection_string)
+
+    eventWriter(foodEventsTable, batchSize, foodEventsFeed, config.get('feed', 'feedPath', fallback=None))(events)
+    conn.close()
+
+
+# Returns a function that deduplicates events, writes them to collection and then
+# rebuilds the feed in feedCollection (unless it is None). The duplicate index is
+# kept between calls, so the daemon builds it only once.
+def eventWriter(collection, batchSize=500, feedCollection=None, feedPath=None):
+    ensureEventIndexes(collection)
+    fingerprintLegacyEvents(collection)
+    eventIndex = newEventIndex()
+    indexStoredEvents(eventIndex, collection)
+
+    def storeEvents(events):
+        counts = writeEvents(collection, deduplicateEvents(events, eventIndex), batchSize)
+        print('Events inserted: %d, updated: %d, skipped: %d' % (counts['inserted'], counts['updated'], counts['skipped']))
+        if feedCollection != None:
+            feed = publishFeed(collection, feedCollection, feedPath)
+            print('Feed version %d: %d upcoming events%s' % (feed['version'], feed['events'], '' if feed['changed'] else ', unchanged'))
+        return counts
+    return storeEvents
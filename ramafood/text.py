@@ -0,0 +1,183 @@
+# Text clean-up shared by the parsers: html2text, paragraph layout, signatures
+import re
+from itertools import tee, islice, chain  #, zip
+
+from ramafood.stats import instrumented, sizeOfFirstArgument
+
+
+# r'(\n|\t|\r){2,}(?=(\*)*[A-Z)])' split the same places, but it tried every
+# position of a run of new lines and backtracked over the rest of the run each
+# time, which is quadratic in the length of the run. The lookbehind makes this one
+# start only at the beginning of a run, so it backtracks over each run once.
+paragraphBreakPattern = re.compile(r'(?<![\n\t\r])(\n|\t|\r){2,}(?=(\*)*[A-Z)])')
+
+def removeAllNewLinesExceptParagraphChanges(bodyText):
+    # paragraphs = re.split(r'(\n|\t|\r){2,}(?=[A-Z])', bodyText)
+    # The regex below splits a text based on paragraphs. Based on my data (Ramapo emails), paragraph
+    # boundaries can be identified by 2 new lines followed by a capital letter
+    # This does not always work but works in most cases.
+    paragraphs = paragraphBreakPattern.split(bodyText)
+    newlines = ('\n', '\t', '\r')
+    # join() instead of += in the loop keeps this linear in the length of the text
+    return ''.join(
+        oldParagraph.replace('\n', " ") + 2*"\n"
+        for oldParagraph in paragraphs
+        if not (oldParagraph == None or oldParagraph in newlines)
+    )
+
+# html2text is imported on the first call, so importing the parsers stays cheap
+@instrumented('html2text', sizeOfFirstArgument)
+def htmlToText(html):
+    import html2text
+    #The html2text parser aove was developed by Aaron Swartz.
+    # I got it from http://www.aaronsw.com/2002/html2text/
+    return html2text.html2text(html)
+
+
+# How textToMarkdown configures html2text: no wrapping, so every line of the text
+# stays one line of the result and the post-filters in beautifyText see whole lines
+htmlConverterOptions = {'body_width': 0}
+
+# Tags, which may span lines, and the line breaks between them
+tagOrNewLinePattern = re.compile(r'<[A-Za-z/!][^<>]*>|\n')
+
+
+def newHtmlConverter():
+    import html2text
+    converter = html2text.HTML2Text()
+    for option, value in htmlConverterOptions.items():
+        setattr(converter, option, value)
+    return converter
+
+
+# html2text over a whole text at once. Every line becomes a paragraph, as when each
+# line went through html2text on its own, but the parser runs once per text and
+# tags that span lines are kept whole. A converter is built for every text: it
+# costs microseconds, and one that saw an unclosed <script> or <pre> would carry
+# it into the next text.
+@instrumented('html2text', sizeOfFirstArgument)
+def textToMarkdown(text):
+    text = tagOrNewLinePattern.sub(lambda m: '<p>' if m.group() == '\n' else m.group(), text)
+    return newHtmlConverter().handle(text)
+
+
+# The post-filters of beautifyText, each over every line of the converted text.
+# The links and lines with images go with the blank lines after them, the way they
+# went when every line was converted on its own.
+linkLinePattern = re.compile(r'^https?:\/\/.*[\r\n]*', re.MULTILINE)
+#[inline image 1] is a familiar pattern I got when parsing email bodies. I want to get rid of that
+imageTypes = ['.jpg', '.jpeg', '.bmp', '.gif', '<', 'KB']
+imageLinePattern = re.compile(r'^.*(?:%s).*[\r\n]*' % '|'.join(re.escape(i) for i in imageTypes), re.MULTILINE)
+
+
+# Removes everything from the first [ to the last ] of every line, when there is
+# something between them ("[]" alone stays). In one pass over the lines:
+# r'\[(\w|\W)+\]' did the same, but scanned to the end of the line from every [
+# that has no ] after it.
+def removeBrackets(body):
+    lines = body.split('\n')
+    for index, line in enumerate(lines):
+        opening = line.find('[')
+        if opening != -1:
+            closing = line.rfind(']')
+            if closing > opening + 1:
+                lines[index] = line[:opening] + line[closing + 1:]
+    return '\n'.join(lines)
+
+
+# Replaces every line mentioning an image with a space
+def scrapLinesWithImages(body):
+    return imageLinePattern.sub(' ', body)
+
+
+def beautifyText(bodyText):
+    body = textToMarkdown(bodyText)    # Remove html tags
+    body = linkLinePattern.sub('', body)       # Remove all links
+    body = scrapLinesWithImages(body)
+    body = removeBrackets(body) #remove everything between [ ]
+    return body
+
+
+# Signature and reply markers.
+# signatureFormats is based on top voted answer in
+# https://stackoverflow.com/questions/1372694/strip-signatures-and-replies-from-emails
+signatureFormats = (
+                        '-----Original Message-----',
+                        # "From: "         # (failsafe four Outlook and some other reply formats)
+                        'Sent from my iPhone',
+                        "Thank you,",
+                        "Thanks,",
+                        "Thank You,",
+                        "Best,",
+                        "Regards",
+                        'Sincerely,',
+                         60 * "=", #This signature character is unique to Ramapo
+                        '505 Ramapo Valley Road',
+                        '505 Ramapo Valley Rd',
+                        "Forward email",
+                        "Best wishes"
+                    )
+
+# The regex markers, each with where the marker starts in a match. Every pattern
+# starts with plain text, which re finds much faster than a character class: the
+# character before "--" and the underscores is checked by a lookbehind after them,
+# so the marker starts one character before the match.
+signatureRegexMarkers = (
+    (re.compile(r'On\W+(?:\w+\W+){11,15}?wrote'), 0),
+    (re.compile(r'Fwd:\b'), 0),
+    (re.compile(r"--(?<=[\n \r*]--) ?[\n\r]"), -1),
+    # (re.compile(r"--(?<=[\r ]--) ?\r"), -1),
+    (re.compile(r'________________________________(?<=[\n\r ]________________________________)[\n\r]'), -1),
+)
+
+# signatureFormats are looked for in the body in lower case, so that "thanks,"
+# and "THANKS," are found too
+signatureFormatsLowerCase = tuple(i.lower() for i in signatureFormats)
+
+# Markers further into the body than signatureScanLimit aren't looked for. That
+# caps the work on huge forwarded threads, and an event is never that far down an
+# email. A marker is at most signatureMarkerLength long ("On ... wrote" with 15
+# long words in between is the longest).
+signatureScanLimit = 100000
+signatureMarkerLength = 1000
+
+
+# The function below removes standard signtatures from emails with food information
+# This function does not detect signatures like "-John" because a hyphen does not always
+# indicate that any text after the hypehn is a signature. Although signatures that simply
+# include a sender's name is extremely common, the name can't be identified as a signature.
+#
+# Only the earliest marker matters, so every search only scans the body up to the
+# earliest marker found so far. On a long reply chain that is the first reply.
+@instrumented('removeSignature', sizeOfFirstArgument)
+def removeSignature(body):
+    scanned = body[:signatureScanLimit]
+    earliest = len(scanned)
+
+    for aPattern, markerStart in signatureRegexMarkers:
+        searched = aPattern.search(scanned, 0, min(earliest + signatureMarkerLength, len(scanned)))
+        if searched != None and searched.start() + markerStart < earliest:
+            earliest = searched.start() + markerStart
+
+    # lower() keeps the length of everything except U+0130, so indexes in the lower
+    # case copy are indexes in body
+    lowerCase = scanned[:earliest + signatureMarkerLength].replace('\u0130', 'i').lower()
+    for i in signatureFormatsLowerCase:
+        index = lowerCase.find(i, 0, earliest + len(i) - 1)
+        if index != -1:
+            earliest = index
+
+    if earliest < len(scanned):
+        body = body[:earliest-1]
+
+    return body
+
+
+#The function below was written by nosklo in stackoverflow at
+#  https://stackoverflow.com/questions/1011938/python-previous-and-next-values-inside-a-loop#1012089
+def previous_and_next(some_iterable):
+    some_iterable = some_iterable.split() #I added this line to make the fucntion work according to my specifications
+    prevs, items, nexts = tee(some_iterable, 3)
+    prevs = chain([None], prevs)
+    nexts = chain(islice(nexts, 1, None), [None])
+    return zip(prevs, items, nexts)